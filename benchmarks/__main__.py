@@ -0,0 +1,151 @@
+"""
+Benchmarks for the render and rasterization hot paths.
+
+    python -m benchmarks [--repeat 5] [--filter format_img] [--save] [--baseline PATH]
+
+Each case runs in its own forked process so the peak memory it reports is its own. Results are
+compared against the saved baseline and the run fails if anything got slower by more than the
+tolerance. Baselines only mean something on the machine that recorded them, so record one on the
+Pi itself
+"""
+import json
+import multiprocessing
+import platform
+import queue
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+import typing
+from pathlib import Path
+
+import click
+
+from .cases import Case, all_cases
+from .inputs import write_inputs
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+RESULT_POLL_SECONDS = 1.0
+
+
+def _measure(case: Case, repeat: int, results: multiprocessing.Queue) -> None:
+    try:
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        case.func()  # Warm up
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            case.func()
+            times.append(time.perf_counter() - start)
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except BaseException:
+        results.put((False, traceback.format_exc()))
+        return
+    results.put((True, (statistics.median(times), max(0, rss_after - rss_before))))
+
+
+def measure(case: Case, repeat: int) -> typing.Dict[str, float]:
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(case, repeat, results))
+    process.start()
+    while True:
+        try:
+            succeeded, result = results.get(timeout=RESULT_POLL_SECONDS)
+            break
+        except queue.Empty:
+            if process.is_alive():
+                continue
+        # The result may have been sent right before the process exited
+        try:
+            succeeded, result = results.get(timeout=RESULT_POLL_SECONDS)
+            break
+        except queue.Empty:
+            process.join()
+            raise click.ClickException(
+                f"Case {case.name} exited with code {process.exitcode} without a result"
+            )
+    process.join()
+    if not succeeded:
+        raise click.ClickException(f"Case {case.name} failed:\n{result}")
+    seconds, peak_kb = result
+    return {
+        "seconds": seconds,
+        "ops_per_second": case.ops_per_call / seconds,
+        "peak_kb": peak_kb,
+    }
+
+
+@click.command()
+@click.option("--repeat", default=5, help="Timed runs per case, the median is reported")
+@click.option(
+    "--filter", "name_filter", default="", help="Only run cases containing this"
+)
+@click.option("--save", is_flag=True, help="Save the results as the new baseline")
+@click.option(
+    "--baseline",
+    type=click.Path(path_type=Path),
+    default=DEFAULT_BASELINE,
+    help="Baseline file to compare against and save to",
+)
+@click.option(
+    "--tolerance", default=0.2, help="Allowed slowdown against the baseline, 0.2 is 20%"
+)
+def main(repeat: int, name_filter: str, save: bool, baseline: Path, tolerance: float):
+    saved: typing.Dict[str, typing.Any] = {}
+    if baseline.exists():
+        saved = json.loads(baseline.read_text(encoding="utf-8"))
+        if saved.get("machine") != platform.machine():
+            print(f"Baseline was recorded on {saved.get('machine')}, not comparing")
+            saved = {}
+    regressions = []
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [
+            case
+            for case in all_cases(inputs=write_inputs(directory=Path(workdir)))
+            if name_filter in case.name
+        ]
+        width = max(len(case.name) for case in cases)
+        print(
+            f"{'case':<{width}}  {'ms/op':>9}  {'ops/s':>10}  {'peak MB':>8}  vs baseline"
+        )
+        for case in cases:
+            result = measure(case=case, repeat=repeat)
+            results[case.name] = result
+            change = ""
+            before = saved.get("results", {}).get(case.name)
+            if before:
+                ratio = result["seconds"] / before["seconds"]
+                change = f"{ratio - 1:+.0%}"
+                if ratio > 1 + tolerance:
+                    regressions.append(case.name)
+                    change += " REGRESSION"
+            print(
+                f"{case.name:<{width}}  "
+                f"{result['seconds'] / case.ops_per_call * 1000:>9.3f}  "
+                f"{result['ops_per_second']:>10.1f}  "
+                f"{result['peak_kb'] / 1024:>8.1f}  {change}"
+            )
+    if save:
+        baseline.write_text(
+            json.dumps(
+                {
+                    "machine": platform.machine(),
+                    "python": platform.python_version(),
+                    "results": {**saved.get("results", {}), **results},
+                },
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        print(f"Saved baseline to {baseline}")
+    if regressions:
+        print(f"{len(regressions)} cases regressed by more than {tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import asyncio
+import typing
+from pathlib import Path
+
+from attr import dataclass
+from PIL import Image
+
+from stimkysticker.labels import LABELS_DICT
+from stimkysticker.labels.brotherdk import BrotherDK
+from stimkysticker.labels.dither import DITHER_MODES, dither
+from stimkysticker.labels.label import StimkyLabelException
+from stimkysticker.printers.brotherql.raster_backend import build_instructions
+from stimkysticker.printers.csn_a2_t import CSNA2T
+from stimkysticker.users import Quota
+
+BROTHER_MODEL = "QL-570"
+QUOTA_OPS = 1000
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    func: typing.Callable[[], typing.Any]
+    # How many operations one call of func does
+    ops_per_call: int = 1
+
+
+def _run(coro: typing.Awaitable) -> typing.Any:
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def label_cases(inputs: typing.Dict[str, Path]) -> typing.Iterator[Case]:
+    for label_name, label in LABELS_DICT.items():
+        for input_name, path in inputs.items():
+            try:
+                label.format_image_for_grayscale_label(image=path)
+            except StimkyLabelException:
+                # Too long for this label, the bot refuses these too
+                continue
+            yield Case(
+                name=f"format_img_grayscale/{label_name}/{input_name}",
+                func=lambda label=label, path=path: label.format_image_for_grayscale_label(
+                    image=path
+                ),
+            )
+            yield Case(
+                name=f"format_img_bw/{label_name}/{input_name}",
+                func=lambda label=label, path=path: label.format_image_for_bw_label(
+                    image=path
+                ),
+            )
+
+
+def csna2_cases(inputs: typing.Dict[str, Path]) -> typing.Iterator[Case]:
+    label = LABELS_DICT["generic-csna2-roll"]
+    for input_name, path in inputs.items():
+        try:
+            formatted = label.format_image_for_bw_label(image=path)
+            # The label cases keep rewriting the formatted file, so keep a copy of our own
+            formatted = formatted.replace(formatted.with_name(f"{path.stem}_bw.png"))
+        except StimkyLabelException:
+            continue
+        yield Case(
+            name=f"img_to_csna2_bmp/{input_name}",
+            func=lambda formatted=formatted: _run(
+                CSNA2T.img_to_csna2_bmp(image_filepath=formatted)
+            ),
+        )
+        bitmap = _run(CSNA2T.img_to_csna2_bmp(image_filepath=formatted))
+        yield Case(
+            name=f"split_image_data/{input_name}",
+            func=lambda bitmap=bitmap: _run(CSNA2T.split_image_data(image_data=bitmap)),
+        )
+
+
+def brother_cases(inputs: typing.Dict[str, Path]) -> typing.Iterator[Case]:
+    for label_name, label in LABELS_DICT.items():
+        if not isinstance(label, BrotherDK):
+            continue
+        for input_name, path in inputs.items():
+            try:
+                image = label.render_for_grayscale_label(
+                    image=path, dither_mode="floyd-steinberg"
+                )
+            except StimkyLabelException:
+                continue
+            yield Case(
+                name=f"brother_raster/{label_name}/{input_name}",
+                func=lambda label=label, image=image: build_instructions(
+                    model=BROTHER_MODEL, label_size=label.size_str, image=image
+                ),
+            )
+
+
+def dither_cases(inputs: typing.Dict[str, Path]) -> typing.Iterator[Case]:
+    for label_name, label in LABELS_DICT.items():
+        for input_name, path in inputs.items():
+            try:
+                image = label.render_for_grayscale_label(image=path)
+            except StimkyLabelException:
+                continue
+            for mode in DITHER_MODES:
+                yield Case(
+                    name=f"dither/{mode}/{label_name}/{input_name}",
+                    func=lambda image=image, mode=mode: dither(
+                        pil_img=image, mode=mode
+                    ),
+                )
+
+
+def quota_cases() -> typing.Iterator[Case]:
+    def use_stickers():
+        quota = Quota(sticker_cost=0.0001, max_stickers=5)
+        user = quota.new_user()
+        for _ in range(QUOTA_OPS):
+            if quota.reserve(user):
+                quota.commit(user)
+            quota.describe(user)
+
+    yield Case(name="user_quota", func=use_stickers, ops_per_call=QUOTA_OPS)
+
+
+def all_cases(inputs: typing.Dict[str, Path]) -> typing.List[Case]:
+    # Decode everything once so lazy plugin imports don't land in the first measurement
+    for path in inputs.values():
+        with Image.open(path) as img:
+            img.load()
+    return [
+        *label_cases(inputs=inputs),
+        *csna2_cases(inputs=inputs),
+        *brother_cases(inputs=inputs),
+        *dither_cases(inputs=inputs),
+        *quota_cases(),
+    ]
@@ -0,0 +1,42 @@
+"""
+Synthetic stand-ins for what people send the bot, stickers are small WebPs with transparency and
+photos are camera sized JPEGs
+"""
+import io
+import typing
+from pathlib import Path
+
+from PIL import Image
+
+# name: (size, mode, format)
+INPUTS: typing.Dict[str, typing.Tuple[typing.Tuple[int, int], str, str]] = {
+    "webp-sticker-512": ((512, 512), "RGBA", "WEBP"),
+    "webp-sticker-tall": ((384, 512), "RGBA", "WEBP"),
+    "jpeg-photo-1280": ((1280, 960), "RGB", "JPEG"),
+    "jpeg-photo-4032": ((4032, 3024), "RGB", "JPEG"),
+    "jpeg-portrait-3024": ((3024, 4032), "RGB", "JPEG"),
+    "jpeg-panorama": ((1800, 600), "RGB", "JPEG"),
+}
+
+
+def synthetic_image(size: typing.Tuple[int, int], mode: str, fmt: str) -> bytes:
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 24)
+    img = Image.merge(
+        "RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT))
+    )
+    if mode == "RGBA":
+        alpha = Image.radial_gradient("L").resize(size).point(lambda v: 255 - v)
+        img.putalpha(alpha)
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+def write_inputs(directory: Path) -> typing.Dict[str, Path]:
+    paths = {}
+    for name, (size, mode, fmt) in INPUTS.items():
+        path = directory / f"{name}.{fmt.lower()}"
+        path.write_bytes(synthetic_image(size=size, mode=mode, fmt=fmt))
+        paths[name] = path
+    return paths
@@ -0,0 +1,144 @@
+"""
+Compare the full resolution render path against the resize-first one on synthetic photos.
+
+    python -m benchmarks.render_resize [--repeat 5]
+
+Both paths have to produce the same label geometry, the label size along with where the photo
+sits on it and how big it is. The script exits non-zero if they don't
+"""
+import io
+import statistics
+import sys
+import time
+import typing
+from pathlib import Path
+
+import click
+from PIL import Image, ImageChops
+
+from stimkysticker.labels import ALL_LABELS
+from stimkysticker.labels.label import Label
+from stimkysticker.labels.resize import LabelLayout
+from stimkysticker.media import DownloadedImage
+
+from .inputs import INPUTS, synthetic_image
+
+SOURCES = {
+    name: INPUTS[name]
+    for name in ("jpeg-photo-4032", "jpeg-portrait-3024", "webp-sticker-512")
+}
+
+
+def legacy_render(label: Label, data: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(data))
+    img = Label.color_correct_grayscale(pil_img=img, gamma_correction=1.8)
+    return label.resize_to_label(
+        pil_img=img,
+        width=label.width_px,
+        height=label.height_px,
+        portrait_label=label.portrait,
+    )
+
+
+def resize_first_render(label: Label, data: bytes, resampling: str) -> Image.Image:
+    # Opened the way a download is, so the JPEG draft decode applies
+    downloaded = DownloadedImage(path=Path("benchmark"), data=data)
+    return label.render_for_grayscale_label(
+        image=downloaded.open_image(), resampling=resampling
+    )
+
+
+def solid_image(size: typing.Tuple[int, int], fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "black").save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+def content_box(img: Image.Image) -> typing.Optional[typing.Tuple[int, ...]]:
+    """
+    :return: Where a black source ended up on the white label
+    """
+    return img.convert("L").point(lambda v: 255 if v < 128 else 0).getbbox()
+
+
+def expected_box(layout: LabelLayout) -> typing.Tuple[int, ...]:
+    x, y = layout.offset
+    width, height = layout.content_size
+    return x, y, x + width, y + height
+
+
+def geometry_mismatches(label: Label, size: typing.Tuple[int, int], fmt: str) -> int:
+    """
+    Render a black source of the same size both ways and check the photo's offset and size on
+    the label against the layout
+    """
+    data = solid_image(size=size, fmt=fmt)
+    layout = label.layout(
+        image_size=size,
+        width=label.width_px,
+        height=label.height_px,
+        portrait_label=label.portrait,
+    )
+    expected = expected_box(layout)
+    mismatches = 0
+    renders = {"full": legacy_render(label, data)}
+    for resampling in ("fast", "quality"):
+        renders[resampling] = resize_first_render(label, data, resampling)
+    for name, rendered in renders.items():
+        if rendered.size != layout.size:
+            print(f"{name}: size mismatch {rendered.size} != {layout.size}")
+            mismatches += 1
+        box = content_box(rendered)
+        if box != expected:
+            print(f"{name}: content box mismatch {box} != {expected}")
+            mismatches += 1
+    return mismatches
+
+
+def timed(func: typing.Callable[[], Image.Image], repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+@click.command()
+@click.option("--repeat", default=5, help="Runs per case, the median is reported")
+def main(repeat: int):
+    mismatches = 0
+    # Wide enough for the longest name plus a gap
+    source_width = max(len(name) for name in SOURCES) + 2
+    label_width = max(len(label.name) for label in ALL_LABELS) + 2
+    print(
+        f"{'source':<{source_width}}{'label':<{label_width}}"
+        f"{'full':>9}{'fast':>16}{'quality':>16}  mean diff"
+    )
+    for name, (size, mode, fmt) in SOURCES.items():
+        data = synthetic_image(size=size, mode=mode, fmt=fmt)
+        for label in ALL_LABELS:
+            legacy_time, legacy = timed(lambda: legacy_render(label, data), repeat)
+            row = (
+                f"{name:<{source_width}}{label.name:<{label_width}}"
+                f"{legacy_time * 1000:>7.1f}ms"
+            )
+            diffs = []
+            for resampling in ("fast", "quality"):
+                new_time, new = timed(
+                    lambda: resize_first_render(label, data, resampling), repeat
+                )
+                row += f"{new_time * 1000:>7.1f}ms ({legacy_time / new_time:>4.1f}x)"
+                if new.size != legacy.size:
+                    print(f"Size mismatch {new.size} != {legacy.size}")
+                    mismatches += 1
+                    continue
+                diff = ImageChops.difference(new, legacy.convert(new.mode))
+                diffs.append(f"{sum(diff.getdata()) / (diff.width * diff.height):.2f}")
+            print(f"{row}  {'/'.join(diffs)}")
+            mismatches += geometry_mismatches(label=label, size=size, fmt=fmt)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
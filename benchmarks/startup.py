@@ -0,0 +1,84 @@
+"""
+Check that the daemon still starts quickly, nothing has to be installed on the Pi to run it.
+
+    python -m benchmarks.startup [--budget 1.5] [--repeat 3]
+
+Imports stimkysticker.__main__ in fresh interpreters with -X importtime, reports the slowest
+imports and exits non-zero if the cumulative import time is over budget, or if any printer
+module, transport library or telethon was imported before it was needed
+"""
+import statistics
+import subprocess
+import sys
+import typing
+
+import click
+
+ENTRY_POINT = "stimkysticker.__main__"
+DEFAULT_BUDGET = 1.5
+# Only imported once the bot starts or a printer that needs them is looked up
+LAZY_MODULES = (
+    "telethon",
+    "brother_ql",
+    "serial",
+    "serial_asyncio",
+    "stimkysticker.printers.brotherql.brotherql",
+    "stimkysticker.printers.csn_a2_t",
+    "stimkysticker.labels.brotherdk",
+    "stimkysticker.labels.generic",
+)
+
+
+def import_times(module: str) -> typing.Dict[str, typing.Tuple[int, int]]:
+    """
+    :return: Self and cumulative import time in microseconds for every module imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # The header
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+@click.command()
+@click.option(
+    "--budget",
+    default=DEFAULT_BUDGET,
+    help="Seconds the daemon's imports may take at most",
+)
+@click.option("--repeat", default=3, help="Cold imports, the median is reported")
+@click.option("--top", default=10, help="Slowest imports to list")
+def main(budget: float, repeat: int, top: int):
+    runs = [import_times(ENTRY_POINT) for _ in range(repeat)]
+    total = statistics.median(run[ENTRY_POINT][1] for run in runs) / 1e6
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)
+    print(f"{'module':<56}{'self':>10}{'cumulative':>12}")
+    for name, (self_us, cumulative_us) in slowest[:top]:
+        print(f"{name:<56}{self_us / 1000:>8.1f}ms{cumulative_us / 1000:>10.1f}ms")
+    print(
+        f"\nImporting {ENTRY_POINT} took {total * 1000:.0f}ms, budget {budget * 1000:.0f}ms"
+    )
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in runs[-1]]
+    if eager:
+        print(f"Imported before they were needed: {', '.join(eager)}")
+        failed = True
+    if total > budget:
+        print("Over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
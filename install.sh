@@ -3,7 +3,6 @@
 echo "This script will do the following"
 echo "- Install all required dependencies"
 echo "- Add the current user to the lp group so they can print"
-echo "- Add \$HOME/.local/bin to \$PATH so you can execute brother-ql"
 echo "- Walk you through creating a config"
 sleep 1
 
@@ -21,10 +20,6 @@ echo "Adding user to lp group"
 current_user=$(whoami)
 sudo usermod -aG lp $current_user
 
-if ($(brother_ql > /dev/null)) ; then
-    echo "Warning: cannot access brother_ql! You may need to add \$HOME/.local/bin to your \$PATH"
-fi
-
 echo "Creating a new stimkysticker config"
 python3 -m stimkysticker --new-config
 
@@ -1,31 +1,142 @@
 import asyncio
+import functools
+import re
 import sys
+import time
 import typing
 from importlib.resources import files
 from os import makedirs
 from pathlib import Path
 
+import attr
 import click
 from loguru import logger
-from telethon import TelegramClient, events
-from telethon.tl.types import DocumentAttributeAnimated
 
-from .config.configfile import DEFAULT_CONFIG_NAME, ConfigFile
+from .cache.manager import CacheManager
+from .cache.render_cache import RenderCache
+from .config.configfile import DEFAULT_CONFIG_NAME, RESTART_REQUIRED, ConfigFile
+from .config.watcher import ConfigWatcher
+from .journal import PRINTED, PrintJournal, PrintRecord
 from .labels.label import StimkyLabelException
-from .printers.brotherql.brotherql import BrotherQl, brother_ql_exists, user_in_lp
-from .printers.printer import StimkyPrinterException
-from .users import User
+from .media import (
+    DownloadedImage,
+    PrintSource,
+    StimkyMediaException,
+    download_image,
+    store_download,
+)
+from .metrics import (
+    CACHE_HIT_RATIO,
+    CACHE_LOOKUPS,
+    ERRORS,
+    QUEUE_DEPTH,
+    REGISTRY,
+    STAGE_SECONDS,
+)
+from .printers.printer import Printer, StimkyPrinterException
+from .render_pool import RenderPool, StimkyRenderPoolException
+from .scheduler import PrintScheduler, StimkySchedulerException
+from .single_flight import SingleFlight
+from .user_store import UserStore
+from .users import Quota
 from .utils.utils import random_bad_emote, random_happy_emote
 
+if typing.TYPE_CHECKING:
+    from telethon import TelegramClient
+
 
-async def main_loop(config_file: ConfigFile):
-    client = await TelegramClient(
-        "bot", int(config_file.api_id), config_file.api_hash
-    ).start(bot_token=config_file.bot_token)
+async def main_loop(
+    config_file: ConfigFile,
+    client: typing.Optional["TelegramClient"] = None,
+    log_level: str = "DEBUG",
+    config_path: typing.Optional[Path] = None,
+):
+    """
+    :param client: Anything that looks enough like a TelegramClient, the simulator passes its
+    own. A real client is started from the config if not given
+    :param config_path: File the config was loaded from, changes to it are applied while
+    running. The config is fixed if not given
+    """
+    # Telethon takes a good part of startup to import, only pay for it once the bot starts
+    from telethon import TelegramClient, events
+    from telethon.tl.types import DocumentAttributeAnimated
+
+    if client is None:
+        client = await TelegramClient(
+            "bot", int(config_file.api_id), config_file.api_hash
+        ).start(bot_token=config_file.bot_token)
     client.flood_sleep_threshold = 120
-    print_log: typing.Dict[int, User] = {}
+    quota = Quota(
+        sticker_cost=config_file.sticker_cost, max_stickers=config_file.sticker_max
+    )
+    users = UserStore(
+        db_path=config_file.user_db,
+        quota=quota,
+        active_within=config_file.user_active_within,
+    )
+    journal = PrintJournal(
+        path=config_file.journal_path,
+        max_bytes=config_file.journal_max_bytes,
+        backups=config_file.journal_backups,
+    )
     logger.remove()
-    logger.add(sys.stdout, level="DEBUG")
+    logger.add(sys.stdout, level=log_level)
+    render_pool = RenderPool(
+        kind=config_file.render_pool,
+        workers=config_file.render_workers,
+        max_queued=config_file.render_queue_max,
+    )
+    cache_manager = CacheManager(
+        cache_dir=config_file.cache_dir,
+        max_bytes=config_file.cache_max_bytes,
+        max_entries=config_file.cache_max_entries,
+        max_age=config_file.cache_max_age or None,
+    )
+    render_cache = RenderCache(
+        cache_dir=config_file.cache_dir / "render", manager=cache_manager
+    )
+
+    def configure_printer(printer: Printer, config: ConfigFile) -> None:
+        printer.render_pool = render_pool
+        printer.render_cache = render_cache
+        printer.gamma_correction = config.gamma_correction
+        printer.background_color = config.background_color
+        printer.save_formatted = type(printer).save_formatted or config.save_formatted
+        printer.resampling = config.resampling
+        printer.batch_columns = config.batch_columns
+
+    for printer in config_file.printers:
+        configure_printer(printer=printer, config=config_file)
+    scheduler = PrintScheduler(
+        printers=config_file.printers,
+        max_jobs=config_file.print_queue_max,
+        admin_id=config_file.admin_id,
+        look_ahead=config_file.print_look_ahead,
+        batch_size=config_file.batch_size,
+        batch_min_queue=config_file.batch_min_queue,
+    )
+    # One download per media id, however many people send it at once
+    downloads: SingleFlight[int, DownloadedImage] = SingleFlight()
+    # Downloads still being written to the cache
+    cache_writes: typing.Set[asyncio.Task] = set()
+    unsaved_downloads: typing.Dict[Path, DownloadedImage] = {}
+
+    async def download_and_cache(msg, path: Path) -> DownloadedImage:
+        with STAGE_SECONDS.time(stage="download", printer=""):
+            downloaded = await download_image(client, msg, path=path)
+        # Print from memory, the cached copy is only for reprints
+        unsaved_downloads[path] = downloaded
+        cache_write = asyncio.create_task(
+            store_download(downloaded=downloaded, cache_manager=cache_manager)
+        )
+
+        def saved(task: asyncio.Task):
+            cache_writes.discard(task)
+            unsaved_downloads.pop(path, None)
+
+        cache_writes.add(cache_write)
+        cache_write.add_done_callback(saved)
+        return downloaded
 
     @client.on(events.NewMessage(pattern="^/id"))
     async def debug_id(ev):
@@ -38,15 +149,66 @@ async def main_loop(config_file: ConfigFile):
     @client.on(events.NewMessage(pattern="^/info"))
     async def info(ev):
         logger.trace(f"Responding to info event from {ev.peer_id.user_id}")
-        if ev.peer_id.user_id not in print_log.keys():
+        user = await users.get(user_id=ev.peer_id.user_id)
+        if user is None:
             logger.error(f"Printer is currently locked for {ev.peer_id.user_id}")
             await ev.respond(
                 f"The printer is currently locked for you\n{random_bad_emote()}\nPlease enter the password! (It's on the printer)"
             )
             return
         logger.debug(f"Responding to {ev.peer_id.user_id} with user info")
+        printed = journal.user(user_id=ev.peer_id.user_id).printed
         await ev.respond(
-            f"{random_happy_emote()}\n{print_log[ev.peer_id.user_id].user_info}"
+            f"{random_happy_emote()}\nYou've printed {printed} sticker{'s' if printed != 1 else ''}.\n"
+            f"{quota.describe(user)}"
+        )
+
+    @client.on(events.NewMessage(pattern="^/status"))
+    async def status(ev):
+        if ev.peer_id.user_id != config_file.admin_id:
+            logger.error(f"{ev.peer_id.user_id} is not allowed to see the status")
+            return
+        logger.debug(f"Responding to {ev.peer_id.user_id} with the printer status")
+        stats = render_pool.stats
+        await ev.respond(
+            f"{random_happy_emote()}\nRender pool: {stats}\n"
+            f"{stats.completed} renders done, {stats.failed} failed, {stats.rejected} rejected\n"
+            f"Render cache: {render_cache.hits} hits, {render_cache.misses} misses, "
+            f"{render_cache.in_flight.shared} shared renders\n"
+            f"Downloads: {downloads.started} started, {downloads.shared} shared\n"
+            f"Cache: {cache_manager.stats}\n"
+            f"Print queue: {len(scheduler)}/{scheduler.max_jobs} jobs, "
+            f"{scheduler.printing}/{len(scheduler.printers)} printers busy, "
+            f"~{scheduler.average_print_time:.0f}s per print"
+        )
+
+    @client.on(events.NewMessage(pattern="^/stats"))
+    async def stats(ev):
+        if ev.peer_id.user_id != config_file.admin_id:
+            logger.error(f"{ev.peer_id.user_id} is not allowed to see the stats")
+            return
+        logger.debug(f"Responding to {ev.peer_id.user_id} with the stage metrics")
+        lines = []
+        for stage, printer in sorted(STAGE_SECONDS.counts):
+            lines.append(
+                f"{stage}{f' ({printer})' if printer else ''}: "
+                f"{STAGE_SECONDS.count(stage=stage, printer=printer)}x, "
+                f"avg {STAGE_SECONDS.mean(stage=stage, printer=printer):.2f}s, "
+                f"p95 <{STAGE_SECONDS.quantile(0.95, stage=stage, printer=printer)}s"
+            )
+        errors = ", ".join(
+            f"{error_type} {count:.0f}"
+            for (error_type,), count in ERRORS.values.items()
+        )
+        await ev.respond(
+            f"{random_happy_emote()}\n"
+            + "\n".join(lines or ["Nothing printed yet"])
+            + f"\nPrinted: {journal.printed} total, {journal.printed_last_hour} in the last "
+            f"hour, {sum(journal.failed.values())} failed\n"
+            f"Queue depth: {len(scheduler)}\n"
+            f"Source cache hit ratio: {cache_manager.stats.hit_ratio:.0%}\n"
+            f"Render cache hit ratio: {render_cache_hit_ratio():.0%}\n"
+            f"Errors: {errors or 'none'}"
         )
 
     @client.on(events.NewMessage(pattern="^/start"))
@@ -56,31 +218,29 @@ async def main_loop(config_file: ConfigFile):
             f"Hewwo! {random_happy_emote()}\nWelcome to **{config_file.fursona_name}'s** STIMKY sticker printer!\n"
             f"{random_happy_emote()}\nSend me a sticker or image to print it!\n{random_happy_emote()}"
         )
-        if (ev.peer_id.user_id not in print_log.keys()) and config_file.password:
+        if config_file.password and await users.get(user_id=ev.peer_id.user_id) is None:
             logger.error(f"Printer is currently locked for {ev.peer_id.user_id}")
             await ev.respond(
                 f"The printer is currently locked for you!\n{random_bad_emote()}\nPlease enter the password! (It's on the printer)"
             )
 
-    # This one triggers on a single message with the pin code written
+    # This one triggers on a single message with the pin code written, matched against
+    # whatever the password is at the time
     @client.on(
-        events.NewMessage(pattern=config_file.password, func=lambda e: e.is_private)
+        events.NewMessage(
+            pattern=lambda text: re.match(config_file.password, text),
+            func=lambda e: e.is_private,
+        )
     )
     async def unlock_printer(ev):
         logger.debug(f"Attempting unlock for {ev.peer_id.user_id}")
-        if ev.peer_id.user_id not in print_log.keys():
-            print_log.update(
-                {
-                    ev.peer_id.user_id: User.new_user(
-                        max_stickers=config_file.sticker_max,
-                        sticker_cost=config_file.sticker_cost,
-                    )
-                }
-            )
+        if await users.get(user_id=ev.peer_id.user_id) is None:
+            user = quota.new_user()
+            users.add(user_id=ev.peer_id.user_id, user=user)
             if config_file.password:
                 logger.success(f"{ev.peer_id.user_id} has unlocked the printer")
                 await ev.respond(
-                    f"Printer is unlocked!!\n{random_happy_emote()}\n{print_log[ev.peer_id.user_id].remaining_stickers_str}\n"
+                    f"Printer is unlocked!!\n{random_happy_emote()}\n{quota.describe(user)}\n"
                     f" Have fun! Awoooooooo!\n{random_happy_emote()}"
                 )
 
@@ -91,25 +251,53 @@ async def main_loop(config_file: ConfigFile):
     )
     async def handler(ev):
         logger.debug(f"New print request from {ev.peer_id.user_id}")
-        msg = ev.message
-        if ev.peer_id.user_id not in print_log.keys():
+        user = await users.get(user_id=ev.peer_id.user_id)
+        if user is None:
             logger.error(f"Printer is currently locked for {ev.peer_id.user_id}")
             await ev.respond(
                 f"The printer is currently locked for you\n{random_bad_emote()}\nPlease enter the password! (It's on the printer)"
             )
             return
-        if not print_log[ev.peer_id.user_id].stickers_remaining:
+        # Held until the print is done, so stickers sent in a burst can't overdraw the quota
+        if not quota.reserve(user):
             logger.error(f"{ev.peer_id.user_id} is out of stickers")
             await ev.respond(
-                f"Cannot print\n{random_bad_emote()}\n{print_log[ev.peer_id.user_id].remaining_stickers_str}"
+                f"Cannot print\n{random_bad_emote()}\n{quota.describe(user)}"
             )
             return
+        users.changed(user_id=ev.peer_id.user_id)
+        record = PrintRecord(user_id=ev.peer_id.user_id, time=time.time())
+        try:
+            await print_media(ev, record=record)
+        finally:
+            if record.result == PRINTED:
+                quota.commit(user)
+            else:
+                quota.refund(user)
+            users.changed(user_id=ev.peer_id.user_id)
+            journal.record(record)
+        if record.result != PRINTED:
+            return
+        logger.success(
+            f"Printed {record.media_id} for {ev.peer_id.user_id} successfully"
+        )
+        await ev.respond(
+            f"Your sticker has printed! {random_happy_emote()}\n{quota.describe(user)}"
+        )
+
+    async def print_media(ev, record: PrintRecord) -> None:
+        """
+        :param record: Filled in with what happened, its result is PRINTED if the sticker printed
+        """
+        msg = ev.message
         # Check if the file is valid
         if msg.photo:
             logger.debug(f"{ev.peer_id.user_id} sent a photo, {msg.photo.id}.jpg")
+            media_id = msg.photo.id
             recieved_image = Path(config_file.cache_dir / f"{msg.photo.id}.jpg")
         elif msg.sticker:
             logger.debug(f"{ev.peer_id.user_id} sent a sticker, {msg.sticker.id}.webp")
+            media_id = msg.sticker.id
             recieved_image = Path(config_file.cache_dir / f"{msg.sticker.id}.webp")
             for att in msg.sticker.attributes:
                 if isinstance(att, DocumentAttributeAnimated):
@@ -118,9 +306,12 @@ async def main_loop(config_file: ConfigFile):
                     break
         else:
             logger.debug(f"Unable to determine media type sent by {ev.peer_id.user_id}")
+            media_id = None
             recieved_image = None
+        record.media_id = media_id
 
         if not recieved_image:
+            record.result = "unsupported"
             logger.debug(f"Unable to print file from {ev.peer_id.user_id}")
             await ev.respond(
                 f"Cannot print this\n{random_bad_emote()}\nTry with a (static) sticker or a picture! "
@@ -129,49 +320,232 @@ async def main_loop(config_file: ConfigFile):
             return
 
         # Download the file unless it's in the cache!
-        if not recieved_image.exists():
+        source: PrintSource = recieved_image
+        if recieved_image in unsaved_downloads:
+            # Just downloaded for someone else, the cached copy isn't written yet
+            source = unsaved_downloads[recieved_image]
+        elif not cache_manager.lookup(recieved_image):
             await ev.respond(
                 f"Downloading your image (can be slow on an RPi {random_happy_emote()} )..."
             )
-            logger.debug(
-                f"{ev.peer_id.user_id}'s image {recieved_image} isn't cached, downloading..."
-            )
-            await client.download_media(msg, file=str(recieved_image))
+            if media_id in downloads:
+                logger.debug(
+                    f"{ev.peer_id.user_id}'s image {recieved_image} is already downloading, waiting..."
+                )
+            else:
+                logger.debug(
+                    f"{ev.peer_id.user_id}'s image {recieved_image} isn't cached, downloading..."
+                )
+            downloading = time.monotonic()
+            try:
+                source = await downloads.run(
+                    key=media_id,
+                    func=functools.partial(download_and_cache, msg, recieved_image),
+                )
+            except StimkyMediaException as e:
+                ERRORS.inc(type=type(e).__name__)
+                record.result = type(e).__name__
+                await ev.respond(f"{random_bad_emote()} Download Error: {e.message}")
+                logger.error(
+                    f"Download Error {e.message} for {ev.peer_id.user_id}'s file"
+                )
+                return
+            finally:
+                record.stages["download"] = time.monotonic() - downloading
         try:
-            await ev.respond(f"Printing! {random_happy_emote()}")
-            logger.trace("Attempting print...")
-            printed = await config_file.printer.print(image_file=Path(recieved_image))
+            # Keep the source around until the print is done
+            with cache_manager.pin(recieved_image):
+                job = scheduler.submit(user_id=ev.peer_id.user_id, image_file=source)
+                position = scheduler.position(job)
+                if position is None:
+                    await ev.respond(f"Printing! {random_happy_emote()}")
+                else:
+                    place = (
+                        f"number {position + 1} in the queue" if position else "up next"
+                    )
+                    await ev.respond(
+                        f"You're {place}, your sticker should print in about "
+                        f"{scheduler.estimated_wait(job):.0f} seconds {random_happy_emote()}"
+                    )
+                logger.trace("Attempting print...")
+                try:
+                    await job.result
+                finally:
+                    if job.printer is not None:
+                        record.printer = job.printer.name
+                        record.label = job.printer.label.name
+                    if job.started is not None:
+                        record.stages["queue"] = job.started - job.submitted
+                        record.stages["print"] = time.monotonic() - job.started
+        except StimkySchedulerException as e:
+            ERRORS.inc(type=type(e).__name__)
+            record.result = type(e).__name__
+            await ev.respond(f"{random_bad_emote()} Busy: {e.message}")
+            logger.error(f"Print queue full for {ev.peer_id.user_id}'s file")
+            return
         except StimkyPrinterException as e:
+            ERRORS.inc(type=type(e).__name__)
+            record.result = type(e).__name__
             await ev.respond(f"{random_bad_emote()} Printer Error: {e.message}")
             logger.error(
                 f"Printer Error {e.message} while printing {ev.peer_id.user_id}'s file"
             )
             return
+        except StimkyRenderPoolException as e:
+            ERRORS.inc(type=type(e).__name__)
+            record.result = type(e).__name__
+            await ev.respond(f"{random_bad_emote()} Busy: {e.message}")
+            logger.error(f"Render pool full while printing {ev.peer_id.user_id}'s file")
+            return
         except StimkyLabelException as e:
+            ERRORS.inc(type=type(e).__name__)
+            record.result = type(e).__name__
             await ev.respond(f"{random_bad_emote()} Label Error: {e.message}")
             logger.error(
                 f"Label Error {e.message} while printing {ev.peer_id.user_id}'s file"
             )
             return
         except Exception as e:
+            ERRORS.inc(type=type(e).__name__)
+            record.result = type(e).__name__
             await ev.respond(f"{random_bad_emote()} Unhandled Error: {e}")
             logger.error(
                 f"Unhandled Error {e} while printing {ev.peer_id.user_id}'s file"
             )
             return
 
-        print_log[ev.peer_id.user_id].use_sticker(image_printed=printed)
-        logger.success(f"Printed {printed} for {ev.peer_id.user_id} successfully")
-        await ev.respond(
-            f"Your sticker has printed! {random_happy_emote()}\n{print_log[ev.peer_id.user_id].remaining_stickers_str}"
+        record.result = PRINTED
+
+    def reload_config(new_config: ConfigFile) -> None:
+        """
+        Apply a changed config file. Everything that can fail is checked before anything is
+        changed, and nothing in here awaits, so a handler either sees the old config or the new
+        one. Printers that are taken out finish their current job first
+        """
+        nonlocal config_file
+        printers = tuple(
+            next(
+                (
+                    running
+                    for running in scheduler.printers
+                    if type(running) is type(printer)
+                    and running.label == printer.label
+                    and running.device == printer.device
+                ),
+                printer,
+            )
+            for printer in new_config.printers
+        )
+        for printer in printers:
+            if printer not in scheduler.printers:
+                printer.check_access()
+        restart_required = {
+            name: getattr(config_file, name)
+            for name in RESTART_REQUIRED
+            if getattr(config_file, name) != getattr(new_config, name)
+        }
+        if restart_required:
+            logger.warning(
+                f"Changes to {', '.join(restart_required)} only apply after a restart"
+            )
+
+        for printer, loaded in zip(printers, new_config.printers):
+            printer.dither = loaded.dither
+            configure_printer(printer=printer, config=new_config)
+        scheduler.max_jobs = new_config.print_queue_max
+        scheduler.admin_id = new_config.admin_id
+        scheduler.look_ahead = new_config.print_look_ahead
+        scheduler.batch_size = new_config.batch_size
+        scheduler.batch_min_queue = new_config.batch_min_queue
+        scheduler.replace_printers(printers=printers)
+        if (new_config.sticker_cost, new_config.sticker_max) != (
+            config_file.sticker_cost,
+            config_file.sticker_max,
+        ):
+            users.set_quota(
+                sticker_cost=new_config.sticker_cost,
+                max_stickers=new_config.sticker_max,
+            )
+        config_file = attr.evolve(
+            new_config,
+            printer=printers[0],
+            extra_printers=printers[1:],
+            **restart_required,
         )
+        for printer in config_file.printers:
+            logger.debug(
+                f"Using printer type {printer.name} and label {printer.label.name} on {printer.device}"
+            )
+
+    def render_cache_hit_ratio() -> float:
+        lookups = render_cache.hits + render_cache.misses
+        return render_cache.hits / lookups if lookups else 0.0
 
-    logger.debug(
-        f"Using printer type {config_file.printer.name} and label {config_file.label.name}"
+    QUEUE_DEPTH.set_function(lambda: len(scheduler))
+    CACHE_LOOKUPS.set_function(lambda: cache_manager.hits, cache="source", result="hit")
+    CACHE_LOOKUPS.set_function(
+        lambda: cache_manager.misses, cache="source", result="miss"
     )
+    CACHE_LOOKUPS.set_function(lambda: render_cache.hits, cache="render", result="hit")
+    CACHE_LOOKUPS.set_function(
+        lambda: render_cache.misses, cache="render", result="miss"
+    )
+    CACHE_HIT_RATIO.set_function(lambda: cache_manager.stats.hit_ratio, cache="source")
+    CACHE_HIT_RATIO.set_function(render_cache_hit_ratio, cache="render")
+    for printer in config_file.printers:
+        logger.debug(
+            f"Using printer type {printer.name} and label {printer.label.name} on {printer.device}"
+        )
     makedirs(config_file.cache_dir, exist_ok=True)
+    cache_manager.load()
+    users.open()
+    journal.open()
+
+    async def save_cache_index():
+        while True:
+            await asyncio.sleep(60)
+            cache_manager.save()
+
     logger.info("Starting client")
-    await client.run_until_disconnected()
+    scheduler_task = asyncio.create_task(scheduler.run())
+    cache_task = asyncio.create_task(save_cache_index())
+    users_task = asyncio.create_task(users.run())
+    journal_task = asyncio.create_task(journal.run())
+    config_task = None
+    if config_path is not None and config_file.config_reload_interval:
+        watcher = ConfigWatcher(
+            config_path=config_path,
+            on_change=reload_config,
+            interval=config_file.config_reload_interval,
+        )
+        config_task = asyncio.create_task(watcher.run())
+    metrics_server = None
+    try:
+        if config_file.metrics_port:
+            try:
+                metrics_server = await REGISTRY.serve(port=config_file.metrics_port)
+            except OSError as e:
+                # Only an optional endpoint, not worth failing to start over
+                logger.error(
+                    f"Unable to serve metrics on port {config_file.metrics_port}, "
+                    f"carrying on without them: {e}"
+                )
+        await client.run_until_disconnected()
+    finally:
+        scheduler_task.cancel()
+        cache_task.cancel()
+        users_task.cancel()
+        journal_task.cancel()
+        if config_task is not None:
+            config_task.cancel()
+        await asyncio.gather(*cache_writes)
+        cache_manager.save()
+        await asyncio.gather(*(printer.close() for printer in scheduler.printers))
+        render_pool.shutdown()
+        users.close()
+        journal.close()
+        if metrics_server is not None:
+            metrics_server.close()
 
 
 async def _start_daemon(new_config: bool):
@@ -180,20 +554,10 @@ async def _start_daemon(new_config: bool):
         ConfigFile.edit_configfile(config_path=config_file)
         return
     config = ConfigFile.try_load(config_path=config_file)
-    if isinstance(config.printer, BrotherQl):
-        if not await user_in_lp():
-            raise StimkyPrinterException(
-                "You are not part of the lp group. Add yourself with "
-                "'sudo usermod -aG $USER lp'"
-            )
-        logger.debug("Ensured that user is part of the lp group")
-        if not await brother_ql_exists():
-            raise StimkyPrinterException(
-                "The brother_ql module is not part of your $PATH. Make sure "
-                "'$HOME/.local/bin' is in your path and brother_ql is installed"
-            )
-        logger.debug("Checked for brother_ql module")
-    await main_loop(config_file=config)
+    for printer in config.printers:
+        printer.check_access()
+    logger.debug("Ensured that user can access every printer")
+    await main_loop(config_file=config, config_path=config_file)
 
 
 @click.command()
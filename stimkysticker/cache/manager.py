@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import json
+import os
+import time
+import typing
+import uuid
+from pathlib import Path
+
+from attr import dataclass
+from loguru import logger
+
+INDEX_NAME = "index.json"
+# Dot files ending in these are half written or half deleted
+TEMP_SUFFIXES = (".tmp", ".evicted")
+
+
+@dataclass
+class CacheEntry:
+    size: int
+    last_access: float
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    entries: int
+    size_bytes: int
+    max_entries: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.entries}/{self.max_entries} files, "
+            f"{self.size_bytes / 1e6:.1f}/{self.max_bytes / 1e6:.1f} MB, "
+            f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+        )
+
+
+class CacheManager:
+    """
+    Keeps the cache directory under a size and file count limit.
+
+    Every file is tracked in an LRU index that is saved next to the files. A restart trusts the
+    index and only lists the directory, files it doesn't know are added and temporaries left
+    behind by a crash are deleted. Only a cache without an index has every file stat()ed. Files
+    that are pinned, e.g. because they are being printed, are never evicted
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_entries: int = 2000,
+        max_age: typing.Optional[float] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+        # Least recently used first
+        self._entries: typing.OrderedDict[str, CacheEntry] = collections.OrderedDict()
+        self._pins: typing.Counter[str] = collections.Counter()
+        self._size = 0
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def index_path(self) -> Path:
+        return self.cache_dir / INDEX_NAME
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            entries=len(self._entries),
+            size_bytes=self._size,
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
+
+    def load(self) -> None:
+        """
+        Load the saved index and reconcile it with the files actually in the cache directory
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        saved: typing.Dict[str, typing.List[float]] = {}
+        try:
+            saved = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ignoring unreadable cache index {self.index_path}: {e}")
+
+        found: typing.List[typing.Tuple[str, CacheEntry]] = []
+        for key, entry in self._scan():
+            if key in saved:
+                size, last_access = saved[key]
+            else:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                size, last_access = stat.st_size, stat.st_mtime
+            found.append((key, CacheEntry(size=size, last_access=last_access)))
+        found.sort(key=lambda item: item[1].last_access)
+
+        self._entries = collections.OrderedDict(found)
+        self._size = sum(entry.size for entry in self._entries.values())
+        self._dirty = True
+        logger.debug(f"Loaded cache index for {self.cache_dir}: {self.stats}")
+        self.evict()
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        data = {
+            key: (entry.size, entry.last_access) for key, entry in self._entries.items()
+        }
+        temp_path = self.index_path.with_name(f".{INDEX_NAME}.{uuid.uuid4().hex}.tmp")
+        try:
+            temp_path.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Unable to save cache index {self.index_path}: {e}")
+            return
+        self._dirty = False
+
+    def lookup(self, path: Path) -> bool:
+        """
+        Check whether a file is cached, counting the hit or miss and refreshing its LRU position
+        """
+        key = self._key(path=path)
+        if key in self._entries and path.exists():
+            self.hits += 1
+            self._touch(key=key)
+            return True
+        self.misses += 1
+        if key in self._entries:
+            self._forget(key=key)
+        return False
+
+    def touch(self, path: Path) -> None:
+        key = self._key(path=path)
+        if key in self._entries:
+            self._touch(key=key)
+
+    def add(self, path: Path) -> None:
+        """
+        Start tracking a file that was just written to the cache, evicting others if needed
+        """
+        key = self._key(path=path)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return
+        if key in self._entries:
+            self._forget(key=key)
+        self._entries[key] = CacheEntry(size=size, last_access=time.time())
+        self._size += size
+        self._dirty = True
+        self.evict()
+
+    @contextlib.contextmanager
+    def pin(self, *paths: Path) -> typing.Iterator[None]:
+        keys = [self._key(path=path) for path in paths]
+        self._pins.update(keys)
+        try:
+            yield
+        finally:
+            self._pins.subtract(keys)
+            self._pins += collections.Counter()  # Drop the zero counts
+
+    def evict(self) -> int:
+        """
+        Delete least recently used files until the cache is within its limits
+        :return: The number of files deleted
+        """
+        expired_before = time.time() - self.max_age if self.max_age else None
+        evicted = 0
+        for key in list(self._entries):
+            entry = self._entries[key]
+            over_limit = (
+                len(self._entries) > self.max_entries or self._size > self.max_bytes
+            )
+            expired = expired_before is not None and entry.last_access < expired_before
+            if not (over_limit or expired):
+                # Everything after this was used more recently
+                break
+            if self._pins[key]:
+                continue
+            self._delete(key=key)
+            evicted += 1
+        if evicted:
+            logger.debug(f"Evicted {evicted} files from {self.cache_dir}: {self.stats}")
+        return evicted
+
+    def _scan(self) -> typing.Iterator[typing.Tuple[str, os.DirEntry]]:
+        """
+        List every cached file without stat()ing it, deleting temporaries on the way
+        """
+        stack = [self.cache_dir]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.name == INDEX_NAME:
+                        continue
+                    if entry.name.startswith("."):
+                        # Nothing is being written before the index is loaded, so any
+                        # temporary or half evicted file was left behind by a crash
+                        if entry.name.endswith(TEMP_SUFFIXES):
+                            self._delete_leftover(path=Path(entry.path))
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield self._key(path=Path(entry.path)), entry
+
+    def _delete_leftover(self, path: Path) -> None:
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.warning(f"Unable to delete leftover {path} from the cache: {e}")
+            return
+        logger.debug(f"Deleted leftover {path} from the cache")
+
+    def _key(self, path: Path) -> str:
+        return os.path.relpath(path, self.cache_dir)
+
+    def _touch(self, key: str) -> None:
+        self._entries[key].last_access = time.time()
+        self._entries.move_to_end(key)
+        self._dirty = True
+
+    def _forget(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+        self._dirty = True
+
+    def _delete(self, key: str) -> None:
+        path = self.cache_dir / key
+        # Rename first so nobody can open a half deleted file
+        trash = path.with_name(f".{path.name}.{uuid.uuid4().hex}.evicted")
+        try:
+            os.replace(path, trash)
+            os.unlink(trash)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Unable to evict {path} from the cache: {e}")
+            return
+        self._forget(key=key)
+        self.evictions += 1
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import os
+import shutil
+import typing
+import uuid
+from pathlib import Path
+
+from attr import dataclass
+from loguru import logger
+from PIL import Image
+
+from ..single_flight import SingleFlight
+from .manager import CacheManager
+
+HASH_CHUNK_SIZE = 1 << 16
+
+
+@dataclass(frozen=True)
+class RenderKey:
+    source_hash: str
+    printer: str
+    label: str
+    gamma_correction: float
+    background_color: str
+    dither: str
+    resampling: str
+
+    @property
+    def digest(self) -> str:
+        params = "\0".join(
+            (
+                self.source_hash,
+                self.printer,
+                self.label,
+                f"{self.gamma_correction}",
+                self.background_color,
+                self.dither,
+                self.resampling,
+            )
+        )
+        return hashlib.blake2b(params.encode(), digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True)
+class RenderedLabel:
+    # Exactly what gets sent to the device, Brother raster instructions or a CSN-A2 bitmap
+    device_data: bytes
+    # The formatted label image, only held in memory
+    image: typing.Optional[Image.Image] = None
+    # Where the formatted image was written, when it is saved for history or previews
+    formatted_image: typing.Optional[Path] = None
+
+
+class RenderCache:
+    """
+    Content addressed store of finished renders. A reprint of the same source bytes with the same
+    render settings skips straight to sending the stored device data
+    """
+
+    FORMATTED_SUFFIX = ".png"
+    DEVICE_SUFFIX = ".bin"
+
+    def __init__(self, cache_dir: Path, manager: typing.Optional[CacheManager] = None):
+        self.cache_dir = cache_dir
+        self.manager = manager
+        # Renders that are still running, so the same render is only ever done once at a time
+        self.in_flight: SingleFlight[RenderKey, RenderedLabel] = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def hash_file(path: Path) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as source:
+            for block in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def get(self, key: RenderKey) -> typing.Optional[RenderedLabel]:
+        formatted_path, device_path = self._paths(key=key)
+        try:
+            device_data = device_path.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if not formatted_path.exists():
+            formatted_path = None
+        if self.manager is not None:
+            self.manager.touch(path=device_path)
+            if formatted_path is not None:
+                self.manager.touch(path=formatted_path)
+        return RenderedLabel(device_data=device_data, formatted_image=formatted_path)
+
+    def put(self, key: RenderKey, rendered: RenderedLabel) -> RenderedLabel:
+        """
+        Store a render. A saved formatted image is moved into the cache, the label code rewrites
+        its output path in place so the cache can't share that file
+        :return: The render pointing at the cached formatted image
+        """
+        formatted_path, device_path = self._paths(key=key)
+        if rendered.formatted_image is None:
+            formatted_path = None
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            if formatted_path is not None:
+                self._store_file(source=rendered.formatted_image, target=formatted_path)
+            # The device data goes last, its presence marks the entry as complete
+            self._store_bytes(data=rendered.device_data, target=device_path)
+        except OSError as e:
+            logger.warning(f"Unable to cache render {key.digest}: {e}")
+            return rendered
+        if self.manager is not None:
+            self.manager.add(path=device_path)
+            if formatted_path is not None:
+                self.manager.add(path=formatted_path)
+        return RenderedLabel(
+            device_data=rendered.device_data,
+            image=rendered.image,
+            formatted_image=formatted_path,
+        )
+
+    def pin(self, rendered: RenderedLabel) -> typing.ContextManager[None]:
+        """
+        Keep the formatted image from being evicted while it is in use
+        """
+        if self.manager is None or rendered.formatted_image is None:
+            return contextlib.nullcontext()
+        return self.manager.pin(rendered.formatted_image)
+
+    def _paths(self, key: RenderKey) -> typing.Tuple[Path, Path]:
+        stem = self.cache_dir / key.digest
+        return (
+            stem.with_suffix(self.FORMATTED_SUFFIX),
+            stem.with_suffix(self.DEVICE_SUFFIX),
+        )
+
+    def _store_file(self, source: Path, target: Path) -> None:
+        try:
+            os.replace(source, target)
+        except OSError:
+            # Different filesystems, copy next to the target first so the swap stays atomic
+            temp_path = self._temp_path(target=target)
+            shutil.copyfile(source, temp_path)
+            os.replace(temp_path, target)
+
+    def _store_bytes(self, data: bytes, target: Path) -> None:
+        temp_path = self._temp_path(target=target)
+        temp_path.write_bytes(data)
+        os.replace(temp_path, target)
+
+    @staticmethod
+    def _temp_path(target: Path) -> Path:
+        # Dot prefixed so a half written entry is never mistaken for a finished one
+        return target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
@@ -4,19 +4,43 @@ import json
 import typing
 from pathlib import Path
 
-from attr import dataclass
+from attr import dataclass, fields_dict
 
 from stimkysticker.converters import (
     structure_label,
     structure_printer,
+    structure_printer_entry,
     unstructure_label,
     unstructure_printer,
+    unstructure_printer_entry,
 )
 from stimkysticker.labels.label import Label
+from stimkysticker.labels.resize import RESAMPLING_MODES
 from stimkysticker.printers import PRINTER_DICT
 from stimkysticker.printers.printer import Printer
 
 DEFAULT_CONFIG_NAME = Path("stimky_config.json")
+# Settings a running daemon can't pick up, a reload keeps the old value until the next restart
+RESTART_REQUIRED = (
+    "api_id",
+    "api_hash",
+    "bot_token",
+    "image_path",
+    "cache_dir",
+    "user_db",
+    "user_active_within",
+    "journal_path",
+    "journal_max_bytes",
+    "journal_backups",
+    "render_pool",
+    "render_workers",
+    "render_queue_max",
+    "metrics_port",
+    "cache_max_bytes",
+    "cache_max_entries",
+    "cache_max_age",
+    "config_reload_interval",
+)
 
 
 @dataclass
@@ -32,6 +56,8 @@ class ConfigFile:
 
     printer: Printer
     label: Label
+    # Any printers past the first one, each with their own label and device
+    extra_printers: typing.Tuple[Printer, ...] = ()
 
     max_aspect_ratio: float = 1.5
     sticker_cost: int = 5 * 60
@@ -39,9 +65,48 @@ class ConfigFile:
 
     image_path: Path = Path("/tmp/image.png")
     cache_dir: Path = Path("/tmp/printercache")
+    # Unlocked users and their quotas, kept across restarts
+    user_db: Path = Path("stimky_users.db")
+    # Seconds since a user's last sticker for them to be loaded at startup, 0 loads everyone
+    user_active_within: float = 30 * 24 * 60 * 60
+    # Every print attempt, one JSON object per line, rotated at journal_max_bytes with
+    # journal_backups older files kept
+    journal_path: Path = Path("stimky_prints.jsonl")
+    journal_max_bytes: int = 16 * 1024 * 1024
+    journal_backups: int = 4
 
     gamma_correction: float = 1.8
     background_color: str = "white"
+    # Write every formatted label next to its source, labels are rendered in memory otherwise
+    save_formatted: bool = False
+    # "fast" or "quality" scaling of images onto the label
+    resampling: str = "quality"
+
+    render_pool: str = "thread"
+    render_workers: int = 2
+    render_queue_max: int = 8
+    print_queue_max: int = 32
+    # Queued jobs rendered ahead while the printers are busy
+    print_look_ahead: int = 2
+    # Up to this many stickers packed onto one continuous label once batch_min_queue jobs
+    # are waiting, 1 prints every sticker on its own
+    batch_size: int = 1
+    batch_min_queue: int = 4
+    # Stickers side by side in a batch, they are scaled down to fit
+    batch_columns: int = 1
+    # Local port serving Prometheus metrics, 0 to turn it off
+    metrics_port: int = 9464
+    # Seconds between checks of the config file for changes, 0 to only read it at startup
+    config_reload_interval: float = 2.0
+
+    cache_max_bytes: int = 256 * 1024 * 1024
+    cache_max_entries: int = 2000
+    # Seconds since last use before a cached file is dropped, 0 to keep files until space runs out
+    cache_max_age: float = 7 * 24 * 60 * 60
+
+    @property
+    def printers(self) -> typing.Tuple[Printer, ...]:
+        return (self.printer, *self.extra_printers)
 
     @staticmethod
     def try_load(config_path: Path) -> ConfigFile:
@@ -92,10 +157,36 @@ class ConfigFile:
             "fursona_name": f"{self.fursona_name}",
             "image_path": f"{self.image_path}",
             "cache_dir": f"{self.cache_dir}",
+            "user_db": f"{self.user_db}",
+            "user_active_within": f"{self.user_active_within}",
+            "journal_path": f"{self.journal_path}",
+            "journal_max_bytes": f"{self.journal_max_bytes}",
+            "journal_backups": f"{self.journal_backups}",
             "gamma_correction": f"{self.gamma_correction}",
             "background_color": f"{self.background_color}",
+            "save_formatted": f"{self.save_formatted}",
+            "resampling": f"{self.resampling}",
+            "render_pool": f"{self.render_pool}",
+            "render_workers": f"{self.render_workers}",
+            "render_queue_max": f"{self.render_queue_max}",
+            "print_queue_max": f"{self.print_queue_max}",
+            "print_look_ahead": f"{self.print_look_ahead}",
+            "batch_size": f"{self.batch_size}",
+            "batch_min_queue": f"{self.batch_min_queue}",
+            "batch_columns": f"{self.batch_columns}",
+            "metrics_port": f"{self.metrics_port}",
+            "config_reload_interval": f"{self.config_reload_interval}",
+            "cache_max_bytes": f"{self.cache_max_bytes}",
+            "cache_max_entries": f"{self.cache_max_entries}",
+            "cache_max_age": f"{self.cache_max_age}",
             "label": f"{structure_label(label=self.label)}",
             "printer": f"{structure_printer(printer=self.printer)}",
+            "device": f"{self.printer.device}",
+            "dither": f"{self.printer.dither}",
+            "printers": [
+                structure_printer_entry(printer=printer)
+                for printer in self.extra_printers
+            ],
         }
         configfile.write_text(json.dumps(data))
 
@@ -105,8 +196,29 @@ class ConfigFile:
         label_str = raw = cls._try_get(configdata=configdata, key="label")
         label = unstructure_label(raw=label_str)
         printer = unstructure_printer(
-            printer=cls._try_get(configdata=configdata, key="printer"), label=label_str
+            printer=cls._try_get(configdata=configdata, key="printer"),
+            label=label_str,
+            device=configdata.get("device"),
+            dither=configdata.get("dither"),
+        )
+        extra_printers = tuple(
+            unstructure_printer_entry(raw=raw) for raw in configdata.get("printers", ())
+        )
+        resampling = cls._get_or_default(configdata=configdata, key="resampling")
+        if resampling not in RESAMPLING_MODES:
+            raise ValueError(
+                f"resampling must be one of {', '.join(RESAMPLING_MODES)}, got {resampling}"
+            )
+        batch_columns = int(
+            cls._get_or_default(configdata=configdata, key="batch_columns")
         )
+        if batch_columns < 1:
+            raise ValueError(f"batch_columns must be at least 1, got {batch_columns}")
+        devices = [p.device for p in (printer, *extra_printers)]
+        if len(set(devices)) != len(devices):
+            raise ValueError(
+                f"Every printer needs its own device, got {', '.join(map(str, devices))}"
+            )
 
         return ConfigFile(
             api_id=cls._try_get(configdata=configdata, key="api_id"),
@@ -122,14 +234,66 @@ class ConfigFile:
             fursona_name=cls._try_get(configdata=configdata, key="fursona_name"),
             image_path=Path(cls._try_get(configdata=configdata, key="image_path")),
             cache_dir=Path(cls._try_get(configdata=configdata, key="cache_dir")),
+            user_db=Path(cls._get_or_default(configdata=configdata, key="user_db")),
+            user_active_within=float(
+                cls._get_or_default(configdata=configdata, key="user_active_within")
+            ),
+            journal_path=Path(
+                cls._get_or_default(configdata=configdata, key="journal_path")
+            ),
+            journal_max_bytes=int(
+                cls._get_or_default(configdata=configdata, key="journal_max_bytes")
+            ),
+            journal_backups=int(
+                cls._get_or_default(configdata=configdata, key="journal_backups")
+            ),
             gamma_correction=float(
                 cls._try_get(configdata=configdata, key="gamma_correction")
             ),
             background_color=cls._try_get(
                 configdata=configdata, key="background_color"
             ),
+            save_formatted=f"{cls._get_or_default(configdata=configdata, key='save_formatted')}"
+            == "True",
+            resampling=resampling,
+            render_pool=cls._get_or_default(configdata=configdata, key="render_pool"),
+            render_workers=int(
+                cls._get_or_default(configdata=configdata, key="render_workers")
+            ),
+            render_queue_max=int(
+                cls._get_or_default(configdata=configdata, key="render_queue_max")
+            ),
+            print_queue_max=int(
+                cls._get_or_default(configdata=configdata, key="print_queue_max")
+            ),
+            print_look_ahead=int(
+                cls._get_or_default(configdata=configdata, key="print_look_ahead")
+            ),
+            batch_size=int(
+                cls._get_or_default(configdata=configdata, key="batch_size")
+            ),
+            batch_min_queue=int(
+                cls._get_or_default(configdata=configdata, key="batch_min_queue")
+            ),
+            batch_columns=batch_columns,
+            metrics_port=int(
+                cls._get_or_default(configdata=configdata, key="metrics_port")
+            ),
+            config_reload_interval=float(
+                cls._get_or_default(configdata=configdata, key="config_reload_interval")
+            ),
+            cache_max_bytes=int(
+                cls._get_or_default(configdata=configdata, key="cache_max_bytes")
+            ),
+            cache_max_entries=int(
+                cls._get_or_default(configdata=configdata, key="cache_max_entries")
+            ),
+            cache_max_age=float(
+                cls._get_or_default(configdata=configdata, key="cache_max_age")
+            ),
             label=label,
             printer=printer,
+            extra_printers=extra_printers,
         )
 
     @classmethod
@@ -138,6 +302,13 @@ class ConfigFile:
             raise ValueError(f"{key} is not present in config file")
         return configdata[key]
 
+    @classmethod
+    def _get_or_default(cls, configdata: dict, key: str) -> typing.Any:
+        # Newer settings fall back to their defaults so older config files keep working
+        if configdata.get(key) is None:
+            return fields_dict(cls)[key].default
+        return configdata[key]
+
 
 class InteractiveConfigBuilder:
     @staticmethod
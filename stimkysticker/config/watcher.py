@@ -0,0 +1,69 @@
+import asyncio
+import os
+import typing
+from pathlib import Path
+
+from loguru import logger
+
+from .configfile import ConfigFile
+
+FileStamp = typing.Tuple[int, int, int]
+
+
+class ConfigWatcher:
+    """
+    Checks the config file for changes and hands every new version that loads to on_change.
+    A file that doesn't load, or that on_change rejects by raising, is logged and the running
+    config stays as it is.
+
+    Polling a stat() is all this needs and works the same on every filesystem, an editor that
+    saves by renaming a new file over the old one is seen as a change too
+    """
+
+    def __init__(
+        self,
+        config_path: Path,
+        on_change: typing.Callable[[ConfigFile], None],
+        interval: float = 2.0,
+    ):
+        self.config_path = config_path
+        self.on_change = on_change
+        self.interval = interval
+        self.reloads = 0
+        self.rejected = 0
+        self._stamp = self._file_stamp()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.check()
+
+    def check(self) -> bool:
+        """
+        :return: If a new config was loaded and applied
+        """
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            config = ConfigFile.from_json(configfile=self.config_path)
+            self.on_change(config)
+        except Exception as e:
+            # Half written files end up here too, the next write is a new change
+            self.rejected += 1
+            logger.error(
+                f"Not reloading {self.config_path}, keeping the running config: {e}"
+            )
+            return False
+        self.reloads += 1
+        logger.success(f"Reloaded {self.config_path}")
+        return True
+
+    def _file_stamp(self) -> typing.Optional[FileStamp]:
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            # Mid way through being replaced
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
@@ -1,4 +1,8 @@
+import typing
+from pathlib import Path
+
 from .labels import LABELS_DICT
+from .labels.dither import DITHER_MODES
 from .labels.label import Label
 from .printers import PRINTER_DICT
 from .printers.printer import Printer
@@ -9,7 +13,7 @@ def structure_label(label: Label) -> str:
 
 
 def unstructure_label(raw: str) -> Label:
-    if LABELS_DICT.get(raw) is None:
+    if raw not in LABELS_DICT:
         raise ValueError(
             f"{raw} is an invalid label type. Valid labels are {', '.join(LABELS_DICT.keys())}"
         )
@@ -20,10 +24,43 @@ def structure_printer(printer: Printer) -> str:
     return printer.name.casefold()
 
 
-def unstructure_printer(printer: str, label: str) -> Printer:
+def unstructure_printer(
+    printer: str,
+    label: str,
+    device: typing.Optional[str] = None,
+    dither: typing.Optional[str] = None,
+) -> Printer:
     label = unstructure_label(label)
-    if PRINTER_DICT.get(printer) is None:
+    if printer not in PRINTER_DICT:
         raise ValueError(
             f"{printer} is not a valid printer. Valid printers are {', '.join(PRINTER_DICT.keys())}"
         )
-    return PRINTER_DICT[printer](label)
+    unstructured = PRINTER_DICT[printer](label, device=Path(device) if device else None)
+    if dither:
+        if dither not in DITHER_MODES:
+            raise ValueError(
+                f"{dither} is not a valid dither mode. Valid modes are {', '.join(DITHER_MODES)}"
+            )
+        unstructured.dither = dither
+    return unstructured
+
+
+def structure_printer_entry(printer: Printer) -> typing.Dict[str, str]:
+    return {
+        "printer": structure_printer(printer=printer),
+        "label": structure_label(label=printer.label),
+        "device": f"{printer.device}",
+        "dither": printer.dither,
+    }
+
+
+def unstructure_printer_entry(raw: typing.Dict[str, str]) -> Printer:
+    for key in ("printer", "label"):
+        if raw.get(key) is None:
+            raise ValueError(f"{key} is not present in printer entry {raw}")
+    return unstructure_printer(
+        printer=raw["printer"],
+        label=raw["label"],
+        device=raw.get("device"),
+        dither=raw.get("dither"),
+    )
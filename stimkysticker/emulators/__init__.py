@@ -0,0 +1,4 @@
+from .brother_ql import BrotherQLEmulator
+from .csn_a2_t import CSNA2TEmulator
+from .pty_device import PtyEmulator, StimkyEmulatorException
+from .report import EmulatorReport
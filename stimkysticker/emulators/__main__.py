@@ -0,0 +1,116 @@
+"""
+Software printers for trying the bot, or a transport change, without the hardware.
+
+    python -m stimkysticker.emulators csn-a2-t [--baud 19200] [--throttle] [--out DIR]
+    python -m stimkysticker.emulators brother-ql [--media 62x0] [--throttle] [--out DIR]
+    python -m stimkysticker.emulators decode CAPTURE [--out DIR]
+
+The first two print the device to point the printer at and run until interrupted. decode reads
+Brother raster instructions from a file or a FIFO until the writer closes it
+"""
+import threading
+import typing
+from pathlib import Path
+
+import click
+
+from ..printers.csn_a2_t import CSNA2T
+from .brother_ql import BrotherQLEmulator
+from .csn_a2_t import CSNA2TEmulator
+from .pty_device import PtyEmulator
+from .report import EmulatorReport
+
+out_option = click.option(
+    "--out",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Save the reconstructed pages here",
+)
+throttle_option = click.option(
+    "--throttle/--no-throttle",
+    default=False,
+    help="Only read as fast as the real transport would deliver",
+)
+
+
+def _report(report: EmulatorReport, out: typing.Optional[Path]) -> None:
+    click.echo(report.summary())
+    if out is not None:
+        for path in report.save_pages(directory=out):
+            click.echo(f"Saved {path}")
+
+
+def _run(emulator: PtyEmulator, out: typing.Optional[Path]) -> None:
+    with emulator:
+        click.echo(f"{emulator.name} emulator on {emulator.device}, Ctrl-C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    _report(report=emulator.report, out=out)
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command("csn-a2-t")
+@click.option("--baud", default=CSNA2T.baud_rate, help="Simulated baud rate")
+@click.option("--print-speed", default=50.0, help="Paper speed in mm/s")
+@throttle_option
+@out_option
+def csn_a2_t(baud: int, print_speed: float, throttle: bool, out: typing.Optional[Path]):
+    _run(
+        emulator=CSNA2TEmulator(
+            baud_rate=baud, print_speed_mm=print_speed, throttle=throttle
+        ),
+        out=out,
+    )
+
+
+def _media(
+    ctx: click.Context, param: click.Parameter, value: typing.Optional[str]
+) -> typing.Optional[typing.Tuple[int, int]]:
+    if value is None:
+        return None
+    try:
+        width, length = value.lower().split("x")
+        return int(width), int(length)
+    except ValueError:
+        raise click.BadParameter(f"Expected WIDTHxLENGTH in mm, got {value}")
+
+
+@main.command("brother-ql")
+@click.option(
+    "--media",
+    default=None,
+    callback=_media,
+    help="Loaded labels as WIDTHxLENGTH in mm, 0 length for rolls. Any media if unset",
+)
+@click.option("--print-speed", default=110.0, help="Paper speed in mm/s")
+@throttle_option
+@out_option
+def brother_ql(
+    media: typing.Optional[typing.Tuple[int, int]],
+    print_speed: float,
+    throttle: bool,
+    out: typing.Optional[Path],
+):
+    _run(
+        emulator=BrotherQLEmulator(
+            print_speed_mm=print_speed, loaded_media=media, throttle=throttle
+        ),
+        out=out,
+    )
+
+
+@main.command("decode")
+@click.argument("capture", type=click.Path(exists=True, path_type=Path))
+@out_option
+def decode(capture: Path, out: typing.Optional[Path]):
+    _report(report=BrotherQLEmulator.decode(capture.read_bytes()), out=out)
+
+
+if __name__ == "__main__":
+    main()
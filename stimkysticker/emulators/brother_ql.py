@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import struct
+import time
+import typing
+
+from PIL import Image
+
+from ..printers.brotherql.raster_backend import STATUS_LENGTH
+from ..printers.raster import PackedBitmap
+from .pty_device import PtyEmulator
+
+ESC = 0x1B
+PRINT = 0x0C
+PRINT_LAST = 0x1A
+
+# Status reply fields, see brother_ql.reader
+STATUS_REPLY = 0x00
+STATUS_PRINTING_COMPLETED = 0x01
+STATUS_ERROR = 0x02
+STATUS_PHASE_CHANGE = 0x06
+PHASE_RECEIVING = 0x00
+PHASE_PRINTING = 0x01
+REPLACE_MEDIA_ERROR = 0x01  # Bit 0 of error information 2
+
+# Payload lengths of the fixed size ESC i commands
+ESC_I_ARGUMENTS = {"a": 1, "!": 1, "z": 10, "M": 1, "A": 1, "K": 1, "d": 2}
+
+
+def unpack_bits(data: bytes) -> bytes:
+    """
+    Undo the TIFF PackBits compression brother_ql uses for raster lines
+    """
+    row = bytearray()
+    index = 0
+    while index < len(data):
+        header = data[index]
+        if header < 0x80:
+            row += data[index + 1 : index + 2 + header]
+            index += 2 + header
+        elif header > 0x80:
+            # A repeated byte
+            row += data[index + 1 : index + 2] * (0x101 - header)
+            index += 2
+        else:
+            # 0x80 is a no-op
+            index += 1
+    return bytes(row)
+
+
+class BrotherQLEmulator(PtyEmulator):
+    """
+    A Brother QL on a pseudo terminal, in place of /dev/usb/lp0. Raster lines are decoded back
+    into one image per printed page and every page is answered with the same status replies
+    the printer sends, so send_instructions confirms the print like it would on the hardware.
+
+    loaded_media is the (width, length) in mm of the labels in the printer, 0 length for
+    continuous rolls. Jobs for any other media get a replace media error
+    """
+
+    name = "Brother QL"
+
+    def __init__(
+        self,
+        bytes_per_second: float = 1_000_000,
+        print_speed_mm: float = 110.0,
+        dpi: int = 300,
+        loaded_media: typing.Optional[typing.Tuple[int, int]] = None,
+        throttle: bool = False,
+    ):
+        super().__init__(
+            byte_time=1 / bytes_per_second,
+            rows_per_second=print_speed_mm * dpi / 25.4,
+            throttle=throttle,
+        )
+        self.loaded_media = loaded_media
+        self.compression = False
+        # Media type, width and length from the last ESC i z
+        self.media: typing.Tuple[int, int, int] = (0, 0, 0)
+        self.expected_rows: typing.Optional[int] = None
+        self._rows: typing.List[bytes] = []
+
+    def _parse(self, buffer: bytearray) -> int:
+        command = buffer[0]
+        if command == 0x00:
+            # Invalidate, a run of zeros to clear out any half sent command
+            run = len(buffer) - len(buffer.lstrip(b"\x00"))
+            self.count(command="invalidate")
+            return run
+        if command in (PRINT, PRINT_LAST):
+            self.count(command="print")
+            self._print()
+            return 1
+        if command == ord("Z"):
+            self.count(command="blank raster")
+            self._rows.append(bytes(len(self._rows[-1]) if self._rows else 90))
+            return 1
+        if command == ord("M"):
+            if len(buffer) < 2:
+                return 0
+            self.count(command="compression")
+            self.compression = buffer[1] == 0x02
+            return 2
+        if command in (ord("g"), ord("w")):
+            if len(buffer) < 3:
+                return 0
+            size = 3 + buffer[2]
+            if len(buffer) < size:
+                return 0
+            self.count(command="raster")
+            row = bytes(buffer[3:size])
+            # Only black is kept from two colour jobs
+            if command == ord("g") or buffer[1] == 0x01:
+                self._rows.append(unpack_bits(row) if self.compression else row)
+            return size
+        if command == ESC:
+            return self._parse_esc(buffer)
+        self.count(command=f"unknown {command:#04x}")
+        return 1
+
+    def _parse_esc(self, buffer: bytearray) -> int:
+        if len(buffer) < 2:
+            return 0
+        if buffer[1] == ord("@"):
+            self.count(command="init")
+            self._rows.clear()
+            return 2
+        if buffer[1] != ord("i"):
+            self.count(command=f"unknown ESC {buffer[1]:#04x}")
+            return 2
+        if len(buffer) < 3:
+            return 0
+        op = chr(buffer[2])
+        if op == "S":
+            self.count(command="status request")
+            self.reply(self._status(status_type=STATUS_REPLY))
+            return 3
+        if op == "U":
+            # Job id and additional media information, both ignored
+            if len(buffer) < 4:
+                return 0
+            size = 4 + 14 if buffer[3] == ord("J") else 5 + 127
+            if len(buffer) < size:
+                return 0
+            self.count(command="extended")
+            return size
+        if op not in ESC_I_ARGUMENTS:
+            self.count(command=f"unknown ESC i {buffer[2]:#04x}")
+            return 3
+        size = 3 + ESC_I_ARGUMENTS[op]
+        if len(buffer) < size:
+            return 0
+        self.count(command=f"ESC i {op}")
+        if op == "z":
+            _, media_type, width, length = buffer[3:7]
+            self.media = (media_type, width, length)
+            (self.expected_rows,) = struct.unpack("<L", buffer[7:11])
+        return size
+
+    def _print(self) -> None:
+        if self.loaded_media is not None and self.loaded_media != self.media[1:]:
+            self.count(command="media error")
+            self._rows.clear()
+            self.reply(
+                self._status(status_type=STATUS_ERROR, error_2=REPLACE_MEDIA_ERROR)
+            )
+            return
+        if self.expected_rows is not None and self.expected_rows != len(self._rows):
+            self.count(command="row count mismatch")
+        rows = len(self._rows)
+        self.reply(
+            self._status(status_type=STATUS_PHASE_CHANGE, phase_type=PHASE_PRINTING)
+        )
+        self._end_page()
+        self.printed(rows=rows)
+        if self.throttle:
+            time.sleep(rows / self.rows_per_second)
+        self.reply(self._status(status_type=STATUS_PRINTING_COMPLETED))
+        self.reply(
+            self._status(status_type=STATUS_PHASE_CHANGE, phase_type=PHASE_RECEIVING)
+        )
+
+    def _end_page(self) -> None:
+        if not self._rows:
+            return
+        row_bytes = max(len(row) for row in self._rows)
+        data = b"".join(row.ljust(row_bytes, b"\x00") for row in self._rows)
+        bitmap = PackedBitmap.from_buffer(data=data, width_px=row_bytes * 8)
+        # Raster lines are sent mirrored
+        self.report.pages.append(
+            bitmap.to_image().transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        )
+        self._rows.clear()
+
+    def _status(
+        self, status_type: int, phase_type: int = PHASE_RECEIVING, error_2: int = 0
+    ) -> bytes:
+        media_type, width, length = self.media
+        status = bytearray(STATUS_LENGTH)
+        status[0:8] = b"\x80\x20\x42\x34\x38\x30\x00\x00"
+        status[9] = error_2
+        status[10] = width
+        status[11] = media_type
+        status[17] = length
+        status[18] = status_type
+        status[19] = phase_type
+        return bytes(status)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import typing
+
+from ..printers.csn_a2_t import CSNA2T
+from ..printers.raster import PackedBitmap
+from ..printers.serial_session import BITS_PER_BYTE
+from .pty_device import PtyEmulator
+
+LF = 0x0A
+DC2 = 0x12
+ESC = 0x1B
+# Dots fed per line feed until ESC 3 says otherwise
+DEFAULT_LINE_SPACING = 32
+
+
+class CSNA2TEmulator(PtyEmulator):
+    """
+    A CSN-A2-T on a pseudo terminal. Bitmaps are stacked into pages, a page ends at the first
+    paper feed after it, which is how the printer code separates stickers
+    """
+
+    name = CSNA2T.name
+
+    def __init__(
+        self,
+        baud_rate: int = CSNA2T.baud_rate,
+        print_speed_mm: float = 50.0,
+        dots_per_mm: float = 8.0,
+        throttle: bool = False,
+    ):
+        super().__init__(
+            byte_time=BITS_PER_BYTE / baud_rate,
+            rows_per_second=print_speed_mm * dots_per_mm,
+            throttle=throttle,
+        )
+        self.line_spacing = DEFAULT_LINE_SPACING
+        self.heating: typing.Optional[typing.Tuple[int, int, int]] = None
+        self.density: typing.Optional[int] = None
+        self._page = bytearray()
+
+    def _parse(self, buffer: bytearray) -> int:
+        command = buffer[0]
+        if command == LF:
+            self.count(command="line feed")
+            self._feed(dots=self.line_spacing)
+            return 1
+        if command in (ESC, DC2):
+            if len(buffer) < 2:
+                return 0
+            if command == ESC:
+                return self._parse_esc(buffer)
+            return self._parse_dc2(buffer)
+        # Anything else would be text, which the bot never sends
+        self.count(command="text")
+        return 1
+
+    def _parse_esc(self, buffer: bytearray) -> int:
+        op = chr(buffer[1])
+        if op == "@":
+            self.count(command="init")
+            self.line_spacing = DEFAULT_LINE_SPACING
+            return 2
+        if op == "2":
+            self.count(command="default line spacing")
+            self.line_spacing = DEFAULT_LINE_SPACING
+            return 2
+        if op == "7":
+            if len(buffer) < 5:
+                return 0
+            self.count(command="heating")
+            self.heating = (buffer[2], buffer[3], buffer[4])
+            return 5
+        if op in "3Jd":
+            if len(buffer) < 3:
+                return 0
+            if op == "3":
+                self.count(command="line spacing")
+                self.line_spacing = buffer[2]
+            else:
+                self.count(command="feed")
+                dots = buffer[2] if op == "J" else buffer[2] * self.line_spacing
+                self._feed(dots=dots)
+            return 3
+        self.count(command=f"unknown ESC {buffer[1]:#04x}")
+        return 2
+
+    def _parse_dc2(self, buffer: bytearray) -> int:
+        op = chr(buffer[1])
+        if op == "#":
+            if len(buffer) < 3:
+                return 0
+            self.count(command="density")
+            self.density = buffer[2]
+            return 3
+        if op in "V*":
+            if len(buffer) < 4:
+                return 0
+            if op == "V":
+                # Full width rows, the height is little endian
+                rows, row_bytes = buffer[2] | buffer[3] << 8, CSNA2T.FIXED_WIDTH
+            else:
+                rows, row_bytes = buffer[2], buffer[3]
+            size = 4 + rows * row_bytes
+            if len(buffer) < size:
+                return 0
+            self.count(command="bitmap")
+            self._bitmap(data=buffer[4:size], rows=rows, row_bytes=row_bytes)
+            return size
+        self.count(command=f"unknown DC2 {buffer[1]:#04x}")
+        return 2
+
+    def _bitmap(self, data: bytearray, rows: int, row_bytes: int) -> None:
+        if row_bytes == CSNA2T.FIXED_WIDTH:
+            self._page += data
+        else:
+            # Narrow bitmaps print at the left edge
+            padding = bytes(max(0, CSNA2T.FIXED_WIDTH - row_bytes))
+            for row in range(rows):
+                start = row * row_bytes
+                self._page += data[start : start + row_bytes][: CSNA2T.FIXED_WIDTH]
+                self._page += padding
+        self.printed(rows=rows)
+
+    def _feed(self, dots: int) -> None:
+        self.printed(rows=dots)
+        self._end_page()
+
+    def _end_page(self) -> None:
+        if not self._page:
+            return
+        bitmap = PackedBitmap.from_buffer(
+            data=bytes(self._page), width_px=CSNA2T.FIXED_WIDTH * 8
+        )
+        self.report.pages.append(bitmap.to_image())
+        self._page.clear()
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import os
+import select
+import threading
+import time
+import tty
+import typing
+from pathlib import Path
+
+from loguru import logger
+
+from ..utils.exceptions import StimkyStickerException
+from .report import EmulatorReport
+
+
+class PtyEmulator:
+    """
+    Base for the software printers. The printer code opens the slave side of a pseudo terminal
+    like it would open the real device, a thread reads the master side and hands the bytes to
+    the command parser. Anything that isn't a whole command yet stays buffered until the rest
+    of it arrives.
+
+    The parser also works without a terminal, decode() runs it over a captured byte stream
+    """
+
+    name: str = "Emulator"
+
+    def __init__(
+        self, byte_time: float, rows_per_second: float, throttle: bool = False
+    ):
+        """
+        :param byte_time: Seconds a single byte takes on the real transport
+        :param rows_per_second: How many dot rows the real print head gets through a second
+        :param throttle: Only read as fast as the real transport delivers, so the printer code
+        sees the same backpressure it would from the hardware
+        """
+        self.byte_time = byte_time
+        self.rows_per_second = rows_per_second
+        self.throttle = throttle
+        self.report = EmulatorReport()
+
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._first_byte: typing.Optional[float] = None
+        self._master: typing.Optional[int] = None
+        self._slave: typing.Optional[int] = None
+        self._device: typing.Optional[Path] = None
+        self._thread: typing.Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def __enter__(self) -> PtyEmulator:
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    @property
+    def device(self) -> Path:
+        if self._device is None:
+            raise StimkyEmulatorException(f"{self.name} emulator is not running")
+        return self._device
+
+    @classmethod
+    def decode(cls, data: bytes, **kwargs) -> EmulatorReport:
+        emulator = cls(**kwargs)
+        emulator.feed(data)
+        return emulator.finish()
+
+    def start(self) -> Path:
+        self._master, self._slave = os.openpty()
+        # No echo and no newline translation, the stream is binary
+        tty.setraw(self._slave)
+        self._device = Path(os.ttyname(self._slave))
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._read_loop, name=f"{self.name}-emulator", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"{self.name} emulator listening on {self._device}")
+        return self._device
+
+    def stop(self) -> EmulatorReport:
+        """
+        Wait for everything already written to be read, then close the terminal
+        :return: The report over everything received since the emulator was created
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master, self._slave, self._device = None, None, None
+        return self.finish()
+
+    def feed(self, data: bytes) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self._first_byte is None:
+                self._first_byte = now
+            self.report.wall_seconds = now - self._first_byte
+            self.report.bytes_received += len(data)
+            self.report.transfer_seconds += len(data) * self.byte_time
+            self._buffer += data
+            while self._buffer:
+                used = self._parse(self._buffer)
+                if not used:
+                    break
+                del self._buffer[:used]
+
+    def finish(self) -> EmulatorReport:
+        with self._lock:
+            if self._buffer:
+                self.count(command="incomplete")
+                logger.warning(
+                    f"{self.name} emulator got {len(self._buffer)} bytes of an unfinished "
+                    f"command: {bytes(self._buffer[:16]).hex()}"
+                )
+                self._buffer.clear()
+            self._end_page()
+            return self.report
+
+    def reply(self, data: bytes) -> None:
+        if self._master is not None:
+            os.write(self._master, data)
+
+    def count(self, command: str) -> None:
+        self.report.commands[command] = self.report.commands.get(command, 0) + 1
+
+    def printed(self, rows: int) -> None:
+        self.report.print_seconds += rows / self.rows_per_second
+
+    def _parse(self, buffer: bytearray) -> int:
+        """
+        Handle the command at the start of the buffer
+        :return: How many bytes it took up, 0 if it isn't complete yet
+        """
+        raise NotImplementedError
+
+    def _end_page(self) -> None:
+        """
+        Turn any rows printed since the last page into an image
+        """
+        raise NotImplementedError
+
+    def _read_loop(self) -> None:
+        read_size = 64 if self.throttle else 4096
+        ready_at = time.monotonic()
+        while True:
+            readable, _, _ = select.select([self._master], [], [], 0.05)
+            if not readable:
+                # Only stop once nothing is left to read
+                if self._stop.is_set():
+                    return
+                continue
+            try:
+                data = os.read(self._master, read_size)
+            except OSError as e:
+                logger.warning(f"{self.name} emulator stopped reading: {e}")
+                return
+            if self.throttle:
+                ready_at = max(ready_at, time.monotonic()) + len(data) * self.byte_time
+                time.sleep(max(0.0, ready_at - time.monotonic()))
+            self.feed(data)
+
+
+class StimkyEmulatorException(StimkyStickerException):
+    def __init__(self, message: str):
+        self.message = message
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import typing
+from pathlib import Path
+
+import attr
+from attr import dataclass
+from PIL import Image
+
+
+@dataclass
+class EmulatorReport:
+    bytes_received: int = 0
+    # How long the bytes would take on the real transport, and the paper through the head
+    transfer_seconds: float = 0.0
+    print_seconds: float = 0.0
+    # Time between the first and the last byte actually arriving at the emulator
+    wall_seconds: float = 0.0
+    pages: typing.List[Image.Image] = attr.Factory(list)
+    commands: typing.Dict[str, int] = attr.Factory(dict)
+
+    @property
+    def simulated_seconds(self) -> float:
+        """
+        Both printers print lines as they arrive, so whichever of the two is slower wins
+        """
+        return max(self.transfer_seconds, self.print_seconds)
+
+    def save_pages(self, directory: Path, file_stem: str = "page") -> typing.List[Path]:
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for number, page in enumerate(self.pages):
+            path = directory / f"{file_stem}{number:04d}.png"
+            page.save(path)
+            paths.append(path)
+        return paths
+
+    def summary(self) -> str:
+        commands = ", ".join(
+            f"{name} x{count}" for name, count in self.commands.items()
+        )
+        return (
+            f"{self.bytes_received} bytes, {len(self.pages)} pages, "
+            f"{self.transfer_seconds:.2f}s transfer, {self.print_seconds:.2f}s print, "
+            f"{self.simulated_seconds:.2f}s simulated, {self.wall_seconds:.2f}s wall "
+            f"({commands})"
+        )
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import time
+import typing
+from pathlib import Path
+
+from attr import asdict, dataclass, field
+from loguru import logger
+
+PRINTED = "printed"
+
+
+@dataclass(slots=True)
+class PrintRecord:
+    user_id: int
+    # Wall clock time the request came in
+    time: float
+    media_id: typing.Optional[int] = None
+    printer: str = ""
+    label: str = ""
+    # PRINTED, or what stopped the print
+    result: str = "failed"
+    # Seconds spent downloading, queued and printing
+    stages: typing.Dict[str, float] = field(factory=dict)
+
+
+@dataclass(slots=True)
+class UserPrints:
+    printed: int = 0
+    failed: int = 0
+    last_printed: float = 0.0
+
+
+class JournalTotals:
+    """
+    Prints counted per user and overall
+    """
+
+    WINDOW_MINUTES = 60
+
+    def __init__(self):
+        self.users: typing.Dict[int, UserPrints] = {}
+        self.printed = 0
+        self.failed: typing.Counter[str] = collections.Counter()
+        self.labels: typing.Counter[str] = collections.Counter()
+        # Prints per minute over the last hour, as (minute, count) slots reused round-robin
+        self.window: typing.List[typing.List[int]] = [
+            [0, 0] for _ in range(self.WINDOW_MINUTES)
+        ]
+
+    @property
+    def printed_last_hour(self) -> int:
+        oldest = int(time.time() // 60) - self.WINDOW_MINUTES
+        return sum(count for minute, count in self.window if minute > oldest)
+
+    def count(self, record: PrintRecord) -> None:
+        user = self.users.get(record.user_id)
+        if user is None:
+            user = self.users[record.user_id] = UserPrints()
+        if record.result != PRINTED:
+            user.failed += 1
+            self.failed[record.result] += 1
+            return
+        user.printed += 1
+        user.last_printed = max(user.last_printed, record.time)
+        self.printed += 1
+        self.labels[record.label] += 1
+        minute = int(record.time // 60)
+        slot = self.window[minute % self.WINDOW_MINUTES]
+        if slot[0] > minute:
+            # Already reused for a later minute
+            return
+        if slot[0] != minute:
+            slot[0], slot[1] = minute, 0
+        slot[1] += 1
+
+    def to_json(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "printed": self.printed,
+            "failed": dict(self.failed),
+            "labels": dict(self.labels),
+            "users": {
+                f"{user_id}": (prints.printed, prints.failed, prints.last_printed)
+                for user_id, prints in self.users.items()
+            },
+            "window": self.window,
+        }
+
+    @classmethod
+    def from_json(cls, data: typing.Dict[str, typing.Any]) -> JournalTotals:
+        totals = cls()
+        totals.printed = data["printed"]
+        totals.failed.update(data["failed"])
+        totals.labels.update(data["labels"])
+        totals.window = data["window"]
+        totals.users = {
+            int(user_id): UserPrints(
+                printed=printed, failed=failed, last_printed=last_printed
+            )
+            for user_id, (printed, failed, last_printed) in data["users"].items()
+        }
+        return totals
+
+
+def _read_records(path: Path) -> typing.Iterator[PrintRecord]:
+    with path.open(encoding="utf-8") as journal:
+        for line in journal:
+            try:
+                yield PrintRecord(**json.loads(line))
+            except (ValueError, TypeError):
+                # A line cut short by a crash
+                continue
+
+
+class PrintJournal:
+    """
+    Every print attempt appended to a JSON lines file, rotated once it reaches max_bytes with
+    up to backups older files kept next to it.
+
+    Totals per user and overall are counted in memory as records come in, so answering /info or
+    /stats never reads the disk. Each rotation folds the totals of the file being rotated out
+    into a snapshot next to the journal, so startup only has to replay the live file on top of
+    it and totals never go down when old files are dropped. Like the user store, records are
+    written in batches by a single background thread
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = 16 * 1024 * 1024,
+        backups: int = 4,
+        flush_interval: float = 2.0,
+    ):
+        self.path = path
+        self.snapshot_path = path.with_name(f"{path.name}.totals")
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+
+        self.totals = JournalTotals()
+        self._pending: typing.List[str] = []
+        self._writer = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="print-journal"
+        )
+
+    @property
+    def printed(self) -> int:
+        return self.totals.printed
+
+    @property
+    def failed(self) -> typing.Counter[str]:
+        return self.totals.failed
+
+    @property
+    def printed_last_hour(self) -> int:
+        return self.totals.printed_last_hour
+
+    def open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        totals, rotated_inode = self._load_snapshot()
+        if rotated_inode is not None and self._inode() == rotated_inode:
+            # Stopped between saving the snapshot and moving the file out of the way, the live
+            # file is already counted
+            self._shift_files()
+            self._save_snapshot(snapshot={**totals.to_json(), "rotated_inode": None})
+        self.totals = totals
+        replayed = 0
+        if self.path.exists():
+            for record in _read_records(self.path):
+                self.totals.count(record)
+                replayed += 1
+        logger.debug(
+            f"Loaded {self.totals.printed} prints from {self.snapshot_path} and replayed "
+            f"{replayed} from {self.path}"
+        )
+
+    def record(self, record: PrintRecord) -> None:
+        self.totals.count(record)
+        self._pending.append(json.dumps(asdict(record), separators=(",", ":")))
+
+    def user(self, user_id: int) -> UserPrints:
+        return self.totals.users.get(user_id) or UserPrints()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch = self._take_batch()
+        if not batch:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._writer, self._write, batch
+            )
+        except OSError as e:
+            logger.error(f"Unable to write to {self.path}, will retry: {e}")
+            self._pending[:0] = batch
+
+    def close(self) -> None:
+        batch = self._take_batch()
+        if batch:
+            try:
+                self._writer.submit(self._write, batch).result()
+            except OSError as e:
+                logger.error(f"Unable to write to {self.path}: {e}")
+        self._writer.shutdown()
+
+    def _take_batch(self) -> typing.List[str]:
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _files(self) -> typing.List[Path]:
+        """
+        :return: The journal and its backups, newest first
+        """
+        return [self.path] + [
+            self.path.with_name(f"{self.path.name}.{number}")
+            for number in range(1, self.backups + 1)
+        ]
+
+    def _inode(self) -> typing.Optional[int]:
+        try:
+            return self.path.stat().st_ino
+        except FileNotFoundError:
+            return None
+
+    def _load_snapshot(self) -> typing.Tuple[JournalTotals, typing.Optional[int]]:
+        """
+        :return: Totals of everything rotated out so far, and the inode of the file the last
+        rotation moved out
+        """
+        try:
+            data = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return JournalTotals(), None
+        return JournalTotals.from_json(data), data["rotated_inode"]
+
+    def _write(self, batch: typing.List[str]) -> None:
+        data = ("\n".join(batch) + "\n").encode()
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        with self.path.open("ab") as journal:
+            journal.write(data)
+
+    def _rotate(self) -> None:
+        # Only ever runs on the writer thread, so the live file is complete up to here
+        totals, _ = self._load_snapshot()
+        for record in _read_records(self.path):
+            totals.count(record)
+        snapshot = totals.to_json()
+        snapshot["rotated_inode"] = self._inode()
+        self._save_snapshot(snapshot=snapshot)
+        self._shift_files()
+        # Done, so a new live file that happens to get the same inode isn't taken for this one
+        snapshot["rotated_inode"] = None
+        self._save_snapshot(snapshot=snapshot)
+        logger.debug(f"Rotated {self.path}")
+
+    def _save_snapshot(self, snapshot: typing.Dict[str, typing.Any]) -> None:
+        temp_path = self.snapshot_path.with_name(f".{self.snapshot_path.name}.tmp")
+        temp_path.write_text(json.dumps(snapshot), encoding="utf-8")
+        os.replace(temp_path, self.snapshot_path)
+
+    def _shift_files(self) -> None:
+        files = self._files()
+        if not self.backups:
+            files[0].unlink()
+            return
+        for newer, older in reversed(list(zip(files, files[1:]))):
+            if newer.exists():
+                os.replace(newer, older)
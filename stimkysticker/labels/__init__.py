@@ -1,9 +1,16 @@
-from .brotherdk import DK2012, DK2205
-from .generic import GenericCSNA2Roll
+from ..utils.registry import LazyRegistry
 
-ALL_LABELS = (DK2012, DK2205, GenericCSNA2Roll)
-LABELS_DICT = {
-    DK2012.name.casefold(): DK2012,
-    DK2205.name.casefold(): DK2205,
-    GenericCSNA2Roll.name.casefold(): GenericCSNA2Roll,
-}
+LABELS_DICT = LazyRegistry(
+    package=__name__,
+    entries={
+        "dk2012": ".brotherdk:DK2012",
+        "dk2205": ".brotherdk:DK2205",
+        "generic-csna2-roll": ".generic:GenericCSNA2Roll",
+    },
+)
+
+
+def __getattr__(name: str):
+    if name == "ALL_LABELS":
+        return tuple(LABELS_DICT.values())
+    return LABELS_DICT.attribute(name)
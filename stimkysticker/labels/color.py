@@ -0,0 +1,54 @@
+import functools
+import typing
+
+from PIL import Image
+
+
+@functools.lru_cache(maxsize=16)
+def gamma_table(gamma_correction: float) -> typing.Tuple[int, ...]:
+    """
+    Lookup table for Image.point that applies a gamma of gamma_correction to one 8 bit band
+    """
+    if gamma_correction == 1:
+        return tuple(range(256))
+    return tuple(
+        int(255 * pow((value / 255), (1 / gamma_correction))) for value in range(256)
+    )
+
+
+def flatten_to_grayscale(
+    pil_img: Image.Image, background_color: str = "white"
+) -> Image.Image:
+    """
+    Convert any Pillow mode to L, placing transparent pixels on top of background_color.
+    The background is only built when the image actually has transparent pixels
+    """
+    if pil_img.mode == "P":
+        # Palette images carry transparency in the image info rather than a band
+        pil_img = pil_img.convert("LA" if "transparency" in pil_img.info else "L")
+    elif pil_img.mode == "PA":
+        pil_img = pil_img.convert("LA")
+
+    if pil_img.mode not in ("RGBA", "LA", "La", "RGBa"):
+        return pil_img if pil_img.mode == "L" else pil_img.convert("L")
+
+    low, _ = pil_img.getchannel("A").getextrema()
+    if low == 255:
+        return pil_img.convert("L")
+    # Composited in RGBA and converted after, the same as the labels always did. Compositing
+    # the L conversion instead rounds differently on partly transparent pixels
+    pil_img = pil_img.convert("RGBA")
+    background = Image.new("RGBA", pil_img.size, background_color)
+    return Image.alpha_composite(background, pil_img).convert("L")
+
+
+def color_correct(
+    pil_img: Image.Image, gamma_correction: float, background_color: str = "white"
+) -> Image.Image:
+    """
+    Flatten alpha, convert to grayscale and apply gamma in one table driven pass
+    """
+    pil_img = flatten_to_grayscale(pil_img=pil_img, background_color=background_color)
+    if gamma_correction != 1:
+        pil_img = pil_img.point(gamma_table(gamma_correction))
+    return pil_img
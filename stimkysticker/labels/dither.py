@@ -0,0 +1,99 @@
+import functools
+import threading
+import typing
+
+from PIL import Image, ImageChops
+
+# Pillow's error diffusion, an ordered 8x8 Bayer pattern, or a plain cut off at mid gray
+DITHER_MODES = ("floyd-steinberg", "bayer", "threshold")
+BAYER_SIZE = 8
+
+# Threshold maps as wide as a label and as tall as the tallest one dithered so far
+_threshold_maps: typing.Dict[int, Image.Image] = {}
+_threshold_maps_lock = threading.Lock()
+# Anything left over after subtracting the threshold is white
+_ABOVE_ZERO = (0,) + (255,) * 255
+
+
+def bayer_matrix(size: int = BAYER_SIZE) -> typing.List[typing.List[int]]:
+    """
+    The recursive Bayer index matrix, every value from 0 to size*size - 1 exactly once
+    """
+    matrix = [[0]]
+    while len(matrix) < size:
+        n = len(matrix)
+        matrix = [
+            [
+                4 * matrix[y % n][x % n] + (0, 2, 3, 1)[(y // n) * 2 + x // n]
+                for x in range(2 * n)
+            ]
+            for y in range(2 * n)
+        ]
+    return matrix
+
+
+@functools.lru_cache(maxsize=1)
+def bayer_tile(size: int = BAYER_SIZE) -> Image.Image:
+    levels = size * size
+    tile = Image.new("L", (size, size))
+    tile.putdata(
+        [
+            (value * 256 + 128) // levels
+            for row in bayer_matrix(size=size)
+            for value in row
+        ]
+    )
+    return tile
+
+
+def threshold_map(width: int, height: int) -> Image.Image:
+    """
+    The Bayer pattern tiled over a width x height label. Built once per label width, and only
+    rebuilt when a longer continuous label comes along
+    """
+    with _threshold_maps_lock:
+        cached = _threshold_maps.get(width)
+        if cached is None or cached.height < height:
+            cached = _tile(tile=bayer_tile(), width=width, height=height)
+            _threshold_maps[width] = cached
+    if cached.height == height:
+        return cached
+    return cached.crop((0, 0, width, height))
+
+
+def _tile(tile: Image.Image, width: int, height: int) -> Image.Image:
+    strip = Image.new("L", (width, tile.height))
+    for left in range(0, width, tile.width):
+        strip.paste(tile, (left, 0))
+    tiled = Image.new("L", (width, height))
+    for top in range(0, height, strip.height):
+        tiled.paste(strip, (0, top))
+    return tiled
+
+
+@functools.lru_cache(maxsize=16)
+def threshold_table(threshold: int) -> typing.Tuple[int, ...]:
+    return tuple(255 if value >= threshold else 0 for value in range(256))
+
+
+def dither(
+    pil_img: Image.Image, mode: str = "floyd-steinberg", threshold: int = 128
+) -> Image.Image:
+    """
+    Turn a label into the 1-bit image the printers print, every mode works on the whole
+    buffer in Pillow's C code
+    :param mode: One of DITHER_MODES
+    :param threshold: The gray level from which pixels turn white, threshold mode only
+    """
+    if pil_img.mode == "1":
+        return pil_img
+    if pil_img.mode != "L":
+        pil_img = pil_img.convert("L")
+    if mode == "floyd-steinberg":
+        return pil_img.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
+    if mode == "threshold":
+        return pil_img.point(threshold_table(threshold), "1")
+    if mode == "bayer":
+        over = ImageChops.subtract(pil_img, threshold_map(*pil_img.size))
+        return over.point(_ABOVE_ZERO, "1")
+    raise ValueError(f"dither must be one of {', '.join(DITHER_MODES)}, got {mode}")
@@ -7,6 +7,18 @@ from loguru import logger
 from PIL import Image, ImageOps
 
 from ..utils.exceptions import StimkyStickerException
+from .color import color_correct, flatten_to_grayscale
+from .dither import dither
+from .resize import (
+    LabelLayout,
+    fit_to_layout,
+    pad_layout,
+    place_on_label,
+    reduce_for_layout,
+)
+
+# Either a file on disk or an image that is already in memory
+ImageSource = typing.Union[Path, Image.Image]
 
 
 @dataclass(frozen=True)
@@ -16,20 +28,66 @@ class Label(ABC):
     height_px_max: int  # Max height to prevent abuse
     width_px: int
 
-    def format_image_for_grayscale_label(self, image: Path) -> Path:
+    def format_image_for_grayscale_label(
+        self,
+        image: Path,
+        background_color: str = "white",
+        gamma_correction: float = 1.8,
+    ) -> Path:
         return self.format_img_grayscale(
             filepath=image,
             width=self.width_px,
             height=self.height_px,
             portrait=self.portrait,
+            background_color=background_color,
+            gamma_correction=gamma_correction,
         )
 
-    def format_image_for_bw_label(self, image: Path) -> Path:
+    def format_image_for_bw_label(
+        self, image: Path, background_color: str = "white"
+    ) -> Path:
         return self.format_img_bw(
             filepath=image,
             width=self.width_px,
             height=self.height_px,
             portrait=self.portrait,
+            background_color=background_color,
+        )
+
+    def render_for_grayscale_label(
+        self,
+        image: ImageSource,
+        background_color: str = "white",
+        gamma_correction: float = 1.8,
+        resampling: str = "quality",
+        dither_mode: typing.Optional[str] = None,
+    ) -> Image.Image:
+        return self.render_img_grayscale(
+            source=image,
+            width=self.width_px,
+            height=self.height_px,
+            portrait=self.portrait,
+            background_color=background_color,
+            gamma_correction=gamma_correction,
+            resampling=resampling,
+            dither_mode=dither_mode,
+        )
+
+    def render_for_bw_label(
+        self,
+        image: ImageSource,
+        background_color: str = "white",
+        resampling: str = "quality",
+        dither_mode: str = "floyd-steinberg",
+    ) -> Image.Image:
+        return self.render_img_bw(
+            source=image,
+            width=self.width_px,
+            height=self.height_px,
+            portrait=self.portrait,
+            background_color=background_color,
+            resampling=resampling,
+            dither_mode=dither_mode,
         )
 
     @property
@@ -48,20 +106,15 @@ class Label(ABC):
         gamma_correction: float = 1.8,
         file_stem: str = "_formatted",
     ) -> Path:
-        if not filepath.exists():
-            raise FileNotFoundError(f"Image {filepath} does not exist")
-        img = Image.open(filepath)
-        img = Label.color_correct_grayscale(
-            pil_img=img,
-            gamma_correction=gamma_correction,
+        img = self.render_img_grayscale(
+            source=filepath,
+            width=width,
+            height=height,
+            portrait=portrait,
             background_color=background_color,
+            gamma_correction=gamma_correction,
         )
-        img = self.resize_to_label(
-            pil_img=img, width=width, height=height, portrait_label=portrait
-        )
-        formatted_path = Path(f"{filepath.parent / filepath.stem}{file_stem}.png")
-        img.save(f"{formatted_path}", "PNG")
-        return formatted_path
+        return Label.save_formatted(pil_img=img, source=filepath, file_stem=file_stem)
 
     def format_img_bw(
         self,
@@ -72,41 +125,109 @@ class Label(ABC):
         background_color: str = "white",
         file_stem: str = "_formatted",
     ):
-        if not filepath.exists():
-            raise FileNotFoundError(f"Image {filepath} does not exist")
-        img = Image.open(filepath)
-        img = Label.color_correct_bw(pil_img=img, background_color=background_color)
-        img = self.resize_to_label(
-            pil_img=img, width=width, height=height, portrait_label=portrait
-        )
-        formatted_path = Path(f"{filepath.parent / filepath.stem}{file_stem}.png")
-        img.save(f"{formatted_path}", "PNG")
+        img = self.render_img_bw(
+            source=filepath,
+            width=width,
+            height=height,
+            portrait=portrait,
+            background_color=background_color,
+        )
+        return Label.save_formatted(pil_img=img, source=filepath, file_stem=file_stem)
+
+    def render_img_grayscale(
+        self,
+        source: ImageSource,
+        width: int,
+        height: typing.Optional[int],
+        portrait: bool,
+        background_color: str = "white",
+        gamma_correction: float = 1.8,
+        resampling: str = "quality",
+        dither_mode: typing.Optional[str] = None,
+    ) -> Image.Image:
+        """
+        :param dither_mode: Dither down to a 1-bit label with this mode, the label stays gray
+        if not given
+        """
+        img = Label.open_image(source=source)
+        layout = self.layout(
+            image_size=img.size, width=width, height=height, portrait_label=portrait
+        )
+        # Shrink first so colour correction never runs at full resolution
+        img = reduce_for_layout(
+            pil_img=img, layout=layout, resampling=resampling, draft_mode="L"
+        )
+        img = Label.color_correct_grayscale(
+            pil_img=img,
+            gamma_correction=gamma_correction,
+            background_color=background_color,
+        )
+        img = fit_to_layout(pil_img=img, layout=layout, resampling=resampling)
+        if dither_mode is not None:
+            img = dither(pil_img=img, mode=dither_mode)
+        return place_on_label(pil_img=img, layout=layout)
+
+    def render_img_bw(
+        self,
+        source: ImageSource,
+        width: int,
+        height: typing.Optional[int],
+        portrait: bool,
+        background_color: str = "white",
+        resampling: str = "quality",
+        dither_mode: str = "floyd-steinberg",
+    ) -> Image.Image:
+        img = Label.open_image(source=source)
+        layout = self.layout(
+            image_size=img.size, width=width, height=height, portrait_label=portrait
+        )
+        img = reduce_for_layout(
+            pil_img=img, layout=layout, resampling=resampling, draft_mode="L"
+        )
+        img = flatten_to_grayscale(pil_img=img, background_color=background_color)
+        # Dither only once the image is at its final size
+        img = fit_to_layout(pil_img=img, layout=layout, resampling=resampling)
+        return place_on_label(
+            pil_img=dither(pil_img=img, mode=dither_mode), layout=layout
+        )
+
+    @staticmethod
+    def open_image(source: ImageSource) -> Image.Image:
+        if isinstance(source, Image.Image):
+            return source
+        if not source.exists():
+            raise FileNotFoundError(f"Image {source} does not exist")
+        return Image.open(source)
+
+    @staticmethod
+    def save_formatted(
+        pil_img: Image.Image, source: Path, file_stem: str = "_formatted"
+    ) -> Path:
+        formatted_path = Path(f"{source.parent / source.stem}{file_stem}.png")
+        pil_img.save(f"{formatted_path}", "PNG")
         return formatted_path
 
     @staticmethod
     def color_correct_grayscale(
         pil_img: Image, gamma_correction: float, background_color: str = "white"
     ):
-        if pil_img.mode == "RGBA":
-            bg_img = Image.new(pil_img.mode, pil_img.size, background_color)
-            pil_img = Image.alpha_composite(bg_img, pil_img)
-
-        # Convert to grayscale and apply a gamma of 1.8
-        pil_img = pil_img.convert("L")
-
-        if gamma_correction != 1:
-            pil_img = Image.eval(
-                pil_img, lambda x: int(255 * pow((x / 255), (1 / gamma_correction)))
-            )
-        return pil_img
+        # Flatten, convert to grayscale and apply the gamma with a cached lookup table
+        return color_correct(
+            pil_img=pil_img,
+            gamma_correction=gamma_correction,
+            background_color=background_color,
+        )
 
     @staticmethod
-    def color_correct_bw(pil_img: Image, background_color: str = "white"):
-        if pil_img.mode == "RGBA":
-            bg_img = Image.new(pil_img.mode, pil_img.size, background_color)
-            pil_img = Image.alpha_composite(bg_img, pil_img)
-        pil_img = pil_img.convert("1")
-        return pil_img
+    def color_correct_bw(
+        pil_img: Image,
+        background_color: str = "white",
+        dither_mode: str = "floyd-steinberg",
+    ):
+        pil_img = flatten_to_grayscale(
+            pil_img=pil_img, background_color=background_color
+        )
+        return dither(pil_img=pil_img, mode=dither_mode)
 
     def resize_to_label(
         self,
@@ -116,12 +237,35 @@ class Label(ABC):
         portrait_label: bool,
         color: str = "white",
     ):
-        img_width, img_height = pil_img.size
+        """
+        Rotate and pad a full resolution image onto the label, the render path gets the same
+        geometry from layout without scaling the full image
+        """
+        layout = self.layout(
+            image_size=pil_img.size,
+            width=width,
+            height=height,
+            portrait_label=portrait_label,
+        )
+        if layout.rotate:
+            pil_img = pil_img.rotate(90, expand=1)
+
+        # Resize to fit the label`
+        return ImageOps.pad(pil_img, layout.size, centering=(0.5, 0.5), color=color)
+
+    def layout(
+        self,
+        image_size: typing.Tuple[int, int],
+        width: int,
+        height: typing.Optional[int],
+        portrait_label: bool,
+    ) -> LabelLayout:
+        img_width, img_height = image_size
         portrait_photo = img_height > img_width
-        if portrait_label != portrait_photo:
+        rotate = portrait_label != portrait_photo
+        if rotate:
             # Flip the image if the label and photo are mismatched aspect ratios
-            pil_img = pil_img.rotate(90, expand=1)
-            img_width, img_height = pil_img.size
+            img_width, img_height = img_height, img_width
         aspect_ratio = img_height / img_width
         # find the new height if there's no limit
         if height is None:
@@ -133,9 +277,9 @@ class Label(ABC):
                     f"long and will eat too much label! Please try an image with a squarer "
                     f"aspect ratio"
                 )
-
-        # Resize to fit the label`
-        return ImageOps.pad(pil_img, (width, height), centering=(0.5, 0.5), color=color)
+        return pad_layout(
+            image_size=(img_width, img_height), size=(width, height), rotate=rotate
+        )
 
 
 class StimkyLabelException(StimkyStickerException):
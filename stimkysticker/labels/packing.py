@@ -0,0 +1,109 @@
+import typing
+
+from attr import dataclass
+from PIL import Image
+
+# Blank space left between stickers printed together, so they can be cut apart
+STICKER_GAP_PX = 16
+
+
+@dataclass(frozen=True)
+class Placement:
+    # Position of the sticker in the list that was packed
+    index: int
+    offset: typing.Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class PackedPage:
+    size: typing.Tuple[int, int]
+    placements: typing.Tuple[Placement, ...]
+
+
+def pack_pages(
+    sizes: typing.Sequence[typing.Tuple[int, int]],
+    width: int,
+    max_height: int,
+    gap: int = STICKER_GAP_PX,
+) -> typing.List[PackedPage]:
+    """
+    Shelf pack stickers onto continuous label pages, tallest first. Each shelf holds as many
+    stickers side by side as fit the label width, shelves stack down the label until the next
+    one would pass max_height, then a new page starts
+    """
+    order = sorted(range(len(sizes)), key=lambda index: -sizes[index][1])
+    pages: typing.List[typing.List[typing.List[int]]] = []
+    for index in order:
+        sticker_width, sticker_height = sizes[index]
+        if sticker_width > width or sticker_height > max_height:
+            raise ValueError(
+                f"A {sticker_width}x{sticker_height} sticker doesn't fit a label "
+                f"{width} wide and at most {max_height} long"
+            )
+        if not _fit_on_shelf(
+            shelves=pages[-1] if pages else [],
+            index=index,
+            sizes=sizes,
+            width=width,
+            max_height=max_height,
+            gap=gap,
+        ):
+            pages.append([[index]])
+    return [
+        _place_shelves(shelves=shelves, sizes=sizes, width=width, gap=gap)
+        for shelves in pages
+    ]
+
+
+def _fit_on_shelf(
+    shelves: typing.List[typing.List[int]],
+    index: int,
+    sizes: typing.Sequence[typing.Tuple[int, int]],
+    width: int,
+    max_height: int,
+    gap: int,
+) -> bool:
+    if not shelves:
+        return False
+    for shelf in shelves:
+        used = sum(sizes[placed][0] for placed in shelf) + gap * len(shelf)
+        # Shelves are as tall as their first sticker, everything after it is shorter
+        if used + sizes[index][0] <= width:
+            shelf.append(index)
+            return True
+    height = sum(sizes[shelf[0]][1] for shelf in shelves) + gap * len(shelves)
+    if height + sizes[index][1] > max_height:
+        return False
+    shelves.append([index])
+    return True
+
+
+def _place_shelves(
+    shelves: typing.List[typing.List[int]],
+    sizes: typing.Sequence[typing.Tuple[int, int]],
+    width: int,
+    gap: int,
+) -> PackedPage:
+    placements = []
+    top = 0
+    for shelf in shelves:
+        shelf_width = sum(sizes[index][0] for index in shelf) + gap * (len(shelf) - 1)
+        shelf_height = sizes[shelf[0]][1]
+        # Center the shelf across the label, and each sticker within the shelf's height
+        left = (width - shelf_width) // 2
+        for index in shelf:
+            sticker_width, sticker_height = sizes[index]
+            offset = (left, top + (shelf_height - sticker_height) // 2)
+            placements.append(Placement(index=index, offset=offset))
+            left += sticker_width + gap
+        top += shelf_height + gap
+    return PackedPage(size=(width, top - gap), placements=tuple(placements))
+
+
+def compose_page(
+    stickers: typing.Sequence[Image.Image], page: PackedPage, color: str = "white"
+) -> Image.Image:
+    image = Image.new(stickers[page.placements[0].index].mode, page.size, color)
+    for placement in page.placements:
+        image.paste(stickers[placement.index], placement.offset)
+    return image
@@ -0,0 +1,106 @@
+import typing
+
+from attr import dataclass
+from PIL import Image
+
+# Final resampling filter, and how much larger than the target the image is kept by the cheap
+# JPEG draft and reduce() steps before that filter runs
+RESAMPLING_MODES: typing.Dict[str, typing.Tuple[int, float]] = {
+    "fast": (Image.Resampling.BILINEAR, 1.0),
+    "quality": (Image.Resampling.BICUBIC, 2.0),
+}
+
+
+@dataclass(frozen=True)
+class LabelLayout:
+    # Turn the source a quarter turn so it matches the label orientation
+    rotate: bool
+    # Size of the finished label image
+    size: typing.Tuple[int, int]
+    # Size and position of the scaled source on the label, after rotating
+    content_size: typing.Tuple[int, int]
+    offset: typing.Tuple[int, int]
+
+    @property
+    def scaled_size(self) -> typing.Tuple[int, int]:
+        """
+        Size to scale the source to, before it is rotated
+        """
+        width, height = self.content_size
+        return (height, width) if self.rotate else (width, height)
+
+
+def pad_layout(
+    image_size: typing.Tuple[int, int], size: typing.Tuple[int, int], rotate: bool
+) -> LabelLayout:
+    """
+    The same geometry ImageOps.pad gives a centered image, worked out from the sizes alone.
+    image_size is the source size after rotating
+    """
+    image_width, image_height = image_size
+    width, height = size
+    image_ratio = image_width / image_height
+    label_ratio = width / height
+    content_size, offset = size, (0, 0)
+    if image_ratio > label_ratio:
+        new_height = round(image_height / image_width * width)
+        content_size = (width, new_height)
+        offset = (0, round((height - new_height) * 0.5))
+    elif image_ratio < label_ratio:
+        new_width = round(image_width / image_height * height)
+        content_size = (new_width, height)
+        offset = (round((width - new_width) * 0.5), 0)
+    return LabelLayout(
+        rotate=rotate, size=size, content_size=content_size, offset=offset
+    )
+
+
+def reduce_for_layout(
+    pil_img: Image.Image,
+    layout: LabelLayout,
+    resampling: str = "quality",
+    draft_mode: typing.Optional[str] = None,
+) -> Image.Image:
+    """
+    Cheaply shrink the source to no less than the reducing gap times its size on the label, so
+    colour correction and the final resampling filter never see the full resolution image.
+    JPEGs that haven't been decoded yet are decoded at 1/2 to 1/8 scale, in draft_mode if given
+    """
+    _, reducing_gap = RESAMPLING_MODES[resampling]
+    target_width, target_height = layout.scaled_size
+    pil_img.draft(
+        draft_mode,
+        (int(target_width * reducing_gap), int(target_height * reducing_gap)),
+    )
+    factor = int(
+        min(pil_img.width / target_width, pil_img.height / target_height) / reducing_gap
+    )
+    # Palette and bilevel images can't be box filtered
+    if factor > 1 and pil_img.mode not in ("P", "PA", "1"):
+        pil_img = pil_img.reduce(factor)
+    return pil_img
+
+
+def fit_to_layout(
+    pil_img: Image.Image, layout: LabelLayout, resampling: str = "quality"
+) -> Image.Image:
+    """
+    Scale to the exact size on the label and rotate, the rotation only ever moves label sized
+    images around
+    """
+    resample, _ = RESAMPLING_MODES[resampling]
+    if pil_img.size != layout.scaled_size:
+        pil_img = pil_img.resize(layout.scaled_size, resample=resample)
+    if layout.rotate:
+        pil_img = pil_img.transpose(Image.Transpose.ROTATE_90)
+    return pil_img
+
+
+def place_on_label(
+    pil_img: Image.Image, layout: LabelLayout, color: str = "white"
+) -> Image.Image:
+    if pil_img.size == layout.size:
+        return pil_img
+    label_img = Image.new(pil_img.mode, layout.size, color)
+    label_img.paste(pil_img, layout.offset)
+    return label_img
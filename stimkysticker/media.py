@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import typing
+import uuid
+from pathlib import Path
+
+from attr import dataclass
+from loguru import logger
+from PIL import Image, ImageFile
+
+from .cache.manager import CacheManager
+from .labels.label import ImageSource
+from .utils.exceptions import StimkyStickerException
+
+ACCEPTED_FORMATS = ("JPEG", "WEBP", "PNG")
+# Give up on anything that hasn't shown a recognisable image header by now
+MAX_HEADER_BYTES = 64 * 1024
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+MAX_PIXELS = 4096 * 4096
+
+
+@dataclass(frozen=True)
+class DownloadedImage:
+    # Where the source goes in the cache, it may not have been written yet
+    path: Path
+    data: bytes
+
+    def __str__(self) -> str:
+        return f"{self.path}"
+
+    def open_image(self) -> Image.Image:
+        """
+        A fresh, not yet decoded image for every render, so JPEG draft decoding still applies
+        """
+        return Image.open(io.BytesIO(self.data))
+
+
+# Anything the printers can print from, a cached file or a download still in memory
+PrintSource = typing.Union[Path, DownloadedImage]
+
+
+def source_path(source: PrintSource) -> Path:
+    return source.path if isinstance(source, DownloadedImage) else source
+
+
+def label_source(source: PrintSource) -> ImageSource:
+    return source.open_image() if isinstance(source, DownloadedImage) else source
+
+
+class StreamingImageDecoder:
+    """
+    File-like download target that keeps the bytes in memory.
+
+    The image header is checked as soon as it has been received, so a file that isn't a
+    printable image is dropped without downloading the rest of it. Nothing is decoded or hashed
+    here, that happens in the render pool once the image is printed
+    """
+
+    def __init__(self, path: Path, max_bytes: int = MAX_DOWNLOAD_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._buffer = io.BytesIO()
+        self._parser = ImageFile.Parser()
+        self._checked = False
+
+    def write(self, chunk: bytes) -> int:
+        written = self._buffer.write(chunk)
+        if self._buffer.tell() > self.max_bytes:
+            raise StimkyMediaException(
+                f"This file is over {self.max_bytes // (1024 * 1024)} MB, that's too big to print"
+            )
+        if not self._checked:
+            # Past the header the parser would start decoding, so it only ever sees that much
+            self._parser.feed(chunk)
+            self._check_header()
+        return written
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> DownloadedImage:
+        """
+        :return: The downloaded bytes, once their header has been checked
+        """
+        if not self._checked:
+            try:
+                image = Image.open(io.BytesIO(self._buffer.getvalue()))
+            except OSError as e:
+                raise StimkyMediaException(f"Unable to decode this image, {e}")
+            self._check_header(image=image)
+        return DownloadedImage(path=self.path, data=self._buffer.getvalue())
+
+    def _check_header(self, image: typing.Optional[Image.Image] = None) -> None:
+        image = image or self._parser.image
+        if image is None:
+            if self._buffer.tell() > MAX_HEADER_BYTES:
+                raise StimkyMediaException("This doesn't look like an image")
+            return
+        if image.format not in ACCEPTED_FORMATS:
+            raise StimkyMediaException(f"Can't print {image.format} images")
+        width, height = image.size
+        if not width or not height or width * height > MAX_PIXELS:
+            raise StimkyMediaException(
+                f"Can't print a {width}x{height} image, it's too big"
+            )
+        self._checked = True
+
+
+async def download_image(client, message, path: Path) -> DownloadedImage:
+    """
+    Download a message's photo or sticker into memory, decoding it on the way in
+    :param path: Where the image will be cached
+    """
+    decoder = StreamingImageDecoder(path=path)
+    await client.download_media(message, file=decoder)
+    return decoder.close()
+
+
+async def store_download(
+    downloaded: DownloadedImage, cache_manager: typing.Optional[CacheManager] = None
+) -> None:
+    """
+    Write a download to the cache off the print path, it only matters for later reprints
+    """
+    temp_path = downloaded.path.with_name(
+        f".{downloaded.path.name}.{uuid.uuid4().hex}.tmp"
+    )
+
+    def write() -> None:
+        temp_path.write_bytes(downloaded.data)
+        os.replace(temp_path, downloaded.path)
+
+    try:
+        await asyncio.to_thread(write)
+    except OSError as e:
+        logger.warning(f"Unable to cache download {downloaded.path}: {e}")
+        temp_path.unlink(missing_ok=True)
+        return
+    if cache_manager is not None:
+        cache_manager.add(downloaded.path)
+
+
+class StimkyMediaException(StimkyStickerException):
+    def __init__(self, message: str):
+        self.message = message
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
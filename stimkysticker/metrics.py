@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import collections
+import contextlib
+import time
+import typing
+
+from loguru import logger
+
+LabelValues = typing.Tuple[str, ...]
+M = typing.TypeVar("M", bound="Metric")
+
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: typing.Sequence[str], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = (f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: typing.Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def _key(self, labels: typing.Dict[str, typing.Any]) -> LabelValues:
+        return tuple(f"{labels[name]}" for name in self.labels)
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, str, float]]:
+        """
+        :return: Sample name suffix, formatted labels and value for every sample
+        """
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(
+            f"{self.name}{suffix}{labels} {value}"
+            for suffix, labels, value in self.samples()
+        )
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: typing.Sequence[str] = ()):
+        super().__init__(name=name, help=help, labels=labels)
+        self.values: typing.DefaultDict[LabelValues, float] = collections.defaultdict(
+            float
+        )
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.values[self._key(labels)] += amount
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, str, float]]:
+        for key, value in self.values.items():
+            yield "", _format_labels(self.labels, key), value
+
+
+class Gauge(Metric):
+    """
+    Read from a callback at scrape time, for values that already live somewhere else
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: typing.Sequence[str] = (),
+    ):
+        super().__init__(name=name, help=help, labels=labels)
+        self.callbacks: typing.Dict[LabelValues, typing.Callable[[], float]] = {}
+
+    def set_function(self, func: typing.Callable[[], float], **labels) -> None:
+        self.callbacks[self._key(labels)] = func
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, str, float]]:
+        for key, func in self.callbacks.items():
+            yield "", _format_labels(self.labels, key), func()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: typing.Sequence[str] = (),
+        buckets: typing.Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name=name, help=help, labels=labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set, the count in each bucket plus the overflow, then the sum
+        self.counts: typing.Dict[LabelValues, typing.List[int]] = {}
+        self.sums: typing.DefaultDict[LabelValues, float] = collections.defaultdict(
+            float
+        )
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self.counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[key] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels) -> typing.Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        return sum(self.counts.get(self._key(labels), ()))
+
+    def mean(self, **labels) -> float:
+        count = self.count(**labels)
+        return self.sums[self._key(labels)] / count if count else 0.0
+
+    def quantile(self, q: float, **labels) -> float:
+        """
+        Upper bound of the bucket holding the q quantile, inf if it is past the last bucket
+        """
+        counts = self.counts.get(self._key(labels), ())
+        target = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, str, float]]:
+        names = (*self.labels, "le")
+        for key, counts in self.counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield "_bucket", _format_labels(names, (*key, f"{bound}")), cumulative
+            yield "_sum", _format_labels(self.labels, key), self.sums[key]
+            yield "_count", _format_labels(self.labels, key), cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: typing.Dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def expose(self) -> str:
+        """
+        Everything in the Prometheus text exposition format
+        """
+        return "\n".join(metric.expose() for metric in self.metrics.values()) + "\n"
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9464) -> asyncio.Server:
+        server = await asyncio.start_server(self._handle_scrape, host=host, port=port)
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return server
+
+    async def _handle_scrape(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            method, path, *_ = request.split(b" ", 2)
+            if method == b"GET" and path.split(b"?")[0] in (b"/", b"/metrics"):
+                status, body = "200 OK", self.expose().encode()
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except ConnectionError as e:
+            logger.debug(f"Metrics scrape dropped: {e}")
+        finally:
+            writer.close()
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        name="stimky_stage_seconds",
+        help="Time spent in each stage of a print",
+        labels=("stage", "printer"),
+    )
+)
+QUEUE_DEPTH = REGISTRY.register(
+    Gauge(name="stimky_queue_depth", help="Print jobs waiting for a printer")
+)
+CACHE_LOOKUPS = REGISTRY.register(
+    Gauge(
+        name="stimky_cache_lookups",
+        help="Cache lookups since startup",
+        labels=("cache", "result"),
+    )
+)
+CACHE_HIT_RATIO = REGISTRY.register(
+    Gauge(
+        name="stimky_cache_hit_ratio",
+        help="Share of cache lookups that were hits",
+        labels=("cache",),
+    )
+)
+ERRORS = REGISTRY.register(
+    Counter(
+        name="stimky_errors_total",
+        help="Failed prints by exception type",
+        labels=("type",),
+    )
+)
+PRINTS = REGISTRY.register(
+    Counter(
+        name="stimky_prints_total",
+        help="Stickers printed",
+        labels=("printer",),
+    )
+)
@@ -1,11 +1,18 @@
-from .brotherql.ql500 import QL500, QL570
-from .brotherql.qldummy import QLDummy
-from .csn_a2_t import CSNA2T
+from ..utils.registry import LazyRegistry
 
-ALL_PRINTERS = (QL500, QLDummy, CSNA2T)
-PRINTER_DICT = {
-    QL500.name.casefold(): QL500,
-    QL570.name.casefold(): QL570,
-    QLDummy.name.casefold(): QLDummy,
-    CSNA2T.name.casefold(): CSNA2T,
-}
+# Each printer module pulls in its own transport library, so only the configured ones get imported
+PRINTER_DICT = LazyRegistry(
+    package=__name__,
+    entries={
+        "ql-500": ".brotherql.ql500:QL500",
+        "ql-570": ".brotherql.ql500:QL570",
+        "qldummy": ".brotherql.qldummy:QLDummy",
+        "csn-a2-t": ".csn_a2_t:CSNA2T",
+    },
+)
+
+
+def __getattr__(name: str):
+    if name == "ALL_PRINTERS":
+        return tuple(PRINTER_DICT[key] for key in ("ql-500", "qldummy", "csn-a2-t"))
+    return PRINTER_DICT.attribute(name)
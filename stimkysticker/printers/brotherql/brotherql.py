@@ -1,79 +1,97 @@
 import typing
-from asyncio.subprocess import PIPE, STDOUT, create_subprocess_shell
 from pathlib import Path
 
+from loguru import logger
+from PIL import Image
+
 from stimkysticker.labels.brotherdk import BrotherDK
 
-from ...labels.label import Label
+from ...cache.render_cache import RenderedLabel
+from ...labels.label import ImageSource, Label
+from ...media import PrintSource, label_source
+from ...metrics import STAGE_SECONDS
 from ..printer import Printer, StimkyPrinterException
+from .raster_backend import PrintResult, build_instructions, send_instructions
 
 
 class BrotherQl(Printer):
     usb_dev: Path = Path("/dev/usb/lp0")
+    device_group: typing.Optional[str] = "lp"
     name: str
     SUPPORTED_LABELS: typing.Tuple[Label]
 
-    _err_strs = (
-        "errors occured" "printing potentially not successful",  # [sic]
-        "invalid value for",
-    )
-
-    def __init__(self, using_label: BrotherDK):
+    def __init__(self, using_label: BrotherDK, device: typing.Optional[Path] = None):
         self._label = using_label
+        if device is not None:
+            self.usb_dev = device
         super().__init__(using_label=self._label)
 
-    async def _print(self, image_file: Path) -> Path:
+    @property
+    def device(self) -> Path:
+        return self.usb_dev
+
+    async def _render_label(self, image_file: PrintSource) -> RenderedLabel:
+        with STAGE_SECONDS.time(stage="render", printer=self.name):
+            image = await self.render(
+                self._label.render_for_grayscale_label,
+                image=label_source(image_file),
+                background_color=self.background_color,
+                gamma_correction=self.gamma_correction,
+                resampling=self.resampling,
+                dither_mode=self.dither,
+            )
+        with STAGE_SECONDS.time(stage="rasterize", printer=self.name):
+            instructions = await self._rasterize(image=image)
+        return await self._rendered(
+            image_file=image_file, image=image, device_data=instructions
+        )
+
+    async def _render_sticker(self, image: ImageSource, width: int) -> Image.Image:
+        return await self.render(
+            self._label.render_img_grayscale,
+            source=image,
+            width=width,
+            height=None,
+            portrait=True,
+            background_color=self.background_color,
+            gamma_correction=self.gamma_correction,
+            resampling=self.resampling,
+            dither_mode=self.dither,
+        )
+
+    async def _rasterize(self, image: Image.Image) -> bytes:
+        return await self.render(
+            build_instructions,
+            model=self.name,
+            label_size=self._label.size_str,
+            image=image,
+        )
+
+    async def send(self, rendered: RenderedLabel) -> None:
         if not self.usb_dev.exists():
             raise StimkyPrinterException(
                 f"USB device {self.usb_dev} for {self.name} does not exist"
             )
-        formatted_image = self._label.format_image_for_grayscale_label(image=image_file)
-        cmd = (
-            f"brother_ql -m {self.name} -b linux_kernel -p file://{self.usb_dev} print -l {self._label.size_str}"
-            f" {formatted_image} -d"
+        result = await send_instructions(
+            usb_dev=self.usb_dev, instructions=rendered.device_data
         )
-        proc = await create_subprocess_shell(cmd, stdout=PIPE, stderr=STDOUT)
-        stdout, stderr = await proc.communicate()
-        stdout = stdout.decode("utf-8").splitlines()
-        for line in stdout:
-            print(line)
-        await self.check_errs(stdout=stdout, retcode=proc.returncode)
-        return formatted_image
-
-    async def check_errs(self, stdout: typing.List[str], retcode: int):
-        await self.check_bad_label(stdout=stdout)
-        await self.check_all_other_errs(stdout=stdout, retcode=retcode)
+        logger.debug(f"{self.name} print result: {result}")
+        self.check_result(result=result)
 
-    async def check_bad_label(self, stdout: typing.List[str]):
-        for line in stdout:
-            if "replace media error".casefold() in line.casefold():
-                raise StimkyPrinterException(
-                    f"Media error on {self.name} while printing on {self._label.name}. Make "
-                    f"sure that {self._label.name} type labels are loaded into the printer "
-                    f"and the printer is not out of labels"
-                )
-
-    async def check_all_other_errs(self, stdout: typing.List[str], retcode: int):
-        errstrs: typing.List[str] = []
-        for err in self._err_strs:
-            for line in stdout:
-                if err.casefold() in line.casefold():
-                    errstrs.append(err)
-        if errstrs or retcode != 0:
-            exception = f"Error on {self.name} while printing onto label {self._label.name}: Got returncode {retcode}"
+    def check_result(self, result: PrintResult):
+        if result.media_errors:
+            raise StimkyPrinterException(
+                f"Media error on {self.name} while printing on {self._label.name}. Make "
+                f"sure that {self._label.name} type labels are loaded into the printer "
+                f"and the printer is not out of labels"
+            )
+        if not result.ok:
             newline = "\n"
-            if errstrs:
-                exception = f"{exception} and errors \n{newline.join(errstrs)}"
-                raise StimkyPrinterException(exception)
-
-
-async def brother_ql_exists() -> bool:
-    proc = await create_subprocess_shell("brother_ql", stdout=PIPE, stderr=STDOUT)
-    await proc.communicate()
-    return proc.returncode == 0
-
-
-async def user_in_lp() -> bool:
-    proc = await create_subprocess_shell("groups", stdout=PIPE, stderr=STDOUT)
-    out, err = await proc.communicate()
-    return "lp" in out.decode().split()
+            raise StimkyPrinterException(
+                f"Error on {self.name} while printing onto label {self._label.name}: Got "
+                f"errors \n{newline.join(result.errors)}"
+            )
+        if not result.confirmed:
+            logger.warning(
+                f"{self.name} did not confirm the print, printing potentially not successful"
+            )
@@ -1,19 +1,41 @@
 import typing
-from pathlib import Path
 
 from PIL import Image
 
+from ...cache.render_cache import RenderedLabel
 from ...labels.brotherdk import DK2012, DK2205
 from ...labels.label import Label
+from ...media import PrintSource, label_source
+from ...metrics import STAGE_SECONDS
 from .brotherql import BrotherQl
 
 
 class QLDummy(BrotherQl):
     name = "QLDummy"
     SUPPORTED_LABELS: typing.Tuple[Label] = (DK2012, DK2205)
+    # Keep the formatted image so a cached render can still be shown
+    save_formatted: bool = True
+    # Nothing is sent to a device
+    device_group: typing.Optional[str] = None
 
-    async def print(self, image_file: Path) -> Path:
-        img_path = self._label.format_image_for_grayscale_label(image=image_file)
-        pil_img = Image.open(img_path)
+    async def _render_label(self, image_file: PrintSource) -> RenderedLabel:
+        # There's no real model to rasterize for, the formatted image is all we show
+        with STAGE_SECONDS.time(stage="render", printer=self.name):
+            image = await self.render(
+                self._label.render_for_grayscale_label,
+                image=label_source(image_file),
+                background_color=self.background_color,
+                gamma_correction=self.gamma_correction,
+                resampling=self.resampling,
+                dither_mode=self.dither,
+            )
+        return await self._rendered(image_file=image_file, image=image, device_data=b"")
+
+    async def _rasterize(self, image: Image.Image) -> bytes:
+        return b""
+
+    async def send(self, rendered: RenderedLabel) -> None:
+        pil_img = rendered.image
+        if pil_img is None:
+            pil_img = Image.open(rendered.formatted_image)
         pil_img.show(title="Your Label")
-        return img_path
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import typing
+from pathlib import Path
+
+from attr import dataclass
+from brother_ql.conversion import convert
+from brother_ql.raster import BrotherQLRaster
+from brother_ql.reader import interpret_response
+from loguru import logger
+from PIL import Image
+
+# Every status reply from a QL printer is exactly 32 bytes
+STATUS_LENGTH = 32
+MEDIA_ERRORS = (
+    "Replace media error",
+    "No media when printing",
+    "End of media (die-cut size only)",
+    "Media cannot be fed (also when the media end is detected)",
+)
+
+
+@dataclass(frozen=True)
+class PrintResult:
+    bytes_sent: int
+    did_print: bool = False
+    ready_for_next_job: bool = False
+    errors: typing.Tuple[str, ...] = ()
+    status_type: typing.Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def confirmed(self) -> bool:
+        return self.did_print and self.ready_for_next_job
+
+    @property
+    def media_errors(self) -> typing.Tuple[str, ...]:
+        return tuple(err for err in self.errors if err in MEDIA_ERRORS)
+
+
+def build_instructions(
+    model: str, label_size: str, image: Image.Image, dither: bool = False
+) -> bytes:
+    """
+    Build the Brother QL raster instructions for a single label in process
+    :param model: The brother_ql model identifier, e.g. QL-570
+    :param label_size: The brother_ql label identifier, e.g. 62x100
+    :param image: The formatted label image, already dithered to 1-bit by the renderer
+    :param dither: Let brother_ql dither any grays left instead of thresholding them
+    :return: The raw instructions to send to the printer
+    """
+    qlr = BrotherQLRaster(model)
+    qlr.exception_on_warning = True
+    return convert(qlr=qlr, images=[image], label=label_size, dither=dither, cut=True)
+
+
+async def send_instructions(
+    usb_dev: Path, instructions: bytes, timeout: float = 10.0, poll: float = 0.01
+) -> PrintResult:
+    """
+    Write raster instructions to a kernel USB printer device and collect its status replies.
+    The blocking write runs in a worker thread, status reads are non-blocking polls
+    :param usb_dev: The printer device, e.g. /dev/usb/lp0
+    :param instructions: The raster instructions from build_instructions
+    :param timeout: How long to wait for the printer to report that it has finished
+    :param poll: How long to sleep between status reads
+    :return: The structured result of the print
+    """
+    fd = await asyncio.to_thread(os.open, str(usb_dev), os.O_RDWR | os.O_NONBLOCK)
+    try:
+        await asyncio.to_thread(_write_all, fd, instructions)
+        return await _read_status(
+            fd=fd, bytes_sent=len(instructions), timeout=timeout, poll=poll
+        )
+    finally:
+        os.close(fd)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        try:
+            written = os.write(fd, view)
+        except BlockingIOError:
+            time.sleep(0.001)
+            continue
+        view = view[written:]
+
+
+async def _read_status(
+    fd: int, bytes_sent: int, timeout: float, poll: float
+) -> PrintResult:
+    did_print = False
+    ready_for_next_job = False
+    status_type = None
+    errors: typing.List[str] = []
+    buffer = b""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not (did_print and ready_for_next_job):
+        try:
+            buffer += os.read(fd, STATUS_LENGTH)
+        except BlockingIOError:
+            pass
+        if len(buffer) < STATUS_LENGTH:
+            await asyncio.sleep(poll)
+            continue
+        data, buffer = buffer[:STATUS_LENGTH], buffer[STATUS_LENGTH:]
+        try:
+            status = interpret_response(data)
+        except (NameError, ValueError) as e:
+            logger.warning(f"Unable to interpret printer status {data.hex()}: {e}")
+            continue
+        status_type = status["status_type"]
+        if status["errors"]:
+            errors.extend(status["errors"])
+            break
+        if status_type == "Printing completed":
+            did_print = True
+        if (
+            status_type == "Phase change"
+            and status["phase_type"] == "Waiting to receive"
+        ):
+            ready_for_next_job = True
+    return PrintResult(
+        bytes_sent=bytes_sent,
+        did_print=did_print,
+        ready_for_next_job=ready_for_next_job,
+        errors=tuple(errors),
+        status_type=status_type,
+    )
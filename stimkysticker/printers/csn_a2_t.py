@@ -1,21 +1,24 @@
 import typing
-from asyncio.streams import StreamWriter
-from asyncio.subprocess import PIPE, STDOUT, create_subprocess_shell
 from pathlib import Path
 
 from PIL import Image
-from serial_asyncio import open_serial_connection
 
 from stimkysticker.labels.brotherdk import BrotherDK
 
+from ..cache.render_cache import RenderedLabel
 from ..labels.generic import GenericCSNA2Roll
-from ..labels.label import Label
+from ..labels.label import ImageSource, Label
+from ..media import PrintSource, label_source
+from ..metrics import STAGE_SECONDS
 from .printer import Printer, StimkyPrinterException
+from .raster import PackedBitmap
+from .serial_session import SerialSession
 
 
 class CSNA2T(Printer):
     uart_dev: Path = Path("/dev/ttyUSB0")
     baud_rate: int = 19200
+    device_group: typing.Optional[str] = "dialout"
     name: str = "CSN-A2-T"
     SUPPORTED_LABELS: typing.Tuple[Label] = (GenericCSNA2Roll,)
 
@@ -35,47 +38,81 @@ class CSNA2T(Printer):
         int((15 << 4) | 15).to_bytes(length=1, byteorder="little"),
     )
 
-    _initialized: bool = False
-
-    def __init__(self, using_label: BrotherDK):
+    def __init__(self, using_label: BrotherDK, device: typing.Optional[Path] = None):
         self._label = using_label
+        if device is not None:
+            self.uart_dev = device
         super().__init__(using_label=self._label)
+        # One session per printer, the heater setup is only sent when it (re)connects
+        self._session = SerialSession(
+            uart_dev=self.uart_dev,
+            baud_rate=self.baud_rate,
+            init_sequence=CSNA2T.PRINT_INIT_SEQUENCE,
+        )
+
+    @property
+    def device(self) -> Path:
+        return self.uart_dev
+
+    async def close(self) -> None:
+        await self._session.close()
+
+    async def _render_label(self, image_file: PrintSource) -> RenderedLabel:
+        with STAGE_SECONDS.time(stage="render", printer=self.name):
+            image = await self.render(
+                self._label.render_for_bw_label,
+                image=label_source(image_file),
+                background_color=self.background_color,
+                resampling=self.resampling,
+                dither_mode=self.dither,
+            )
+        with STAGE_SECONDS.time(stage="rasterize", printer=self.name):
+            device_data = await self._rasterize(image=image)
+        return await self._rendered(
+            image_file=image_file, image=image, device_data=device_data
+        )
 
-    async def _print(self, image_file: Path) -> Path:
+    async def _render_sticker(self, image: ImageSource, width: int) -> Image.Image:
+        return await self.render(
+            self._label.render_img_bw,
+            source=image,
+            width=width,
+            height=None,
+            portrait=True,
+            background_color=self.background_color,
+            resampling=self.resampling,
+            dither_mode=self.dither,
+        )
+
+    async def _rasterize(self, image: Image.Image) -> bytes:
+        image_data = await self.render(PackedBitmap.from_image, image=image)
+        return image_data.data
+
+    async def send(self, rendered: RenderedLabel) -> None:
         if not self.uart_dev.exists():
             raise StimkyPrinterException(
                 f"Serial UART device {self.uart_dev} for {self.name} does not exist"
             )
-        _, writer = await open_serial_connection(
-            url=str(self.uart_dev), baudrate=self.baud_rate
+        image_data = PackedBitmap.from_buffer(
+            data=rendered.device_data, width_px=self._label.width_px
         )
-        for command in CSNA2T.PRINT_INIT_SEQUENCE:
-            writer.write(command)
-
-        formatted_image = self._label.format_image_for_bw_label(image=image_file)
-        image_data = await CSNA2T.img_to_csna2_bmp(image_filepath=formatted_image)
         chunked_data = await CSNA2T.split_image_data(image_data=image_data)
         for chunk in chunked_data:
             await self.print_image_chunk(image_chunk=chunk)
         await self.block_serial_write(datas=tuple("\n".encode() for _ in range(3)))
-        return formatted_image
 
-    async def block_serial_write(self, datas: typing.Tuple[bytes, ...]):
+    async def block_serial_write(
+        self, datas: typing.Tuple[typing.Union[bytes, memoryview], ...]
+    ):
         """
-        For SOME FUCKING REASON awaiting drain() on the async serial connection doesn't ACTUALLY AWAIT.
-        The only way you can wait is to wait for the whole connection to close
+        Awaiting drain() on the async serial connection doesn't wait for the data to go out,
+        so the session paces the writes from the baud rate and we wait for it to flush
         :param datas: The data to send
         """
-        _, writer = await open_serial_connection(
-            url=str(self.uart_dev), baudrate=self.baud_rate
-        )
-        for data in datas:
-            writer.write(data)
-        await writer.drain()
-        writer.close()
-        await writer.wait_closed()
+        await self._session.write(*datas)
+        await self._session.flush()
 
-    async def print_image_chunk(self, image_chunk: typing.Tuple[bytes]):
+    async def print_image_chunk(self, image_chunk: typing.Union[bytes, memoryview]):
         if len(image_chunk) % CSNA2T.FIXED_WIDTH:
             raise ValueError(
                 f"Malformed image chunk. Chunk length must be divisible by {CSNA2T.FIXED_WIDTH}. "
@@ -97,51 +134,15 @@ class CSNA2T(Printer):
                 f"{CSNA2T.CHUNK_HEIGHT}. Height is {len(image_chunk) / CSNA2T.FIXED_WIDTH} "
                 f"({len(image_chunk)} total length)"
             )
-        await self.block_serial_write(datas=bitmap_commands)
-        await self.block_serial_write(datas=image_chunk)
+        await self._session.write(*bitmap_commands, image_chunk)
 
     @staticmethod
-    async def img_to_csna2_bmp(image_filepath: Path) -> typing.Tuple[bytes, ...]:
-        with Image.open(image_filepath) as image:
-            final_data = []
-            current_byte = 0
-            shifter = 7
-            image = image.convert("1")
-            pixels = list(image.getdata())
-            for pixel in pixels:
-                if shifter == -1:
-                    final_data.append(
-                        int(current_byte).to_bytes(length=1, byteorder="little")
-                    )
-                    current_byte = 0
-                    shifter = 7
-                if pixel == 0:
-                    current_byte |= 1 << shifter
-                shifter -= 1
-            final_data.append(int(current_byte).to_bytes(length=1, byteorder="little"))
-        return tuple(final_data)
+    async def img_to_csna2_bmp(image_filepath: Path) -> PackedBitmap:
+        return PackedBitmap.from_file(image_filepath=image_filepath)
 
     @staticmethod
     async def split_image_data(
-        image_data: typing.Tuple[bytes, ...]
-    ) -> typing.Tuple[typing.Tuple[bytes, ...], ...]:
-        # Don't split the data if it is too small
-        if len(image_data) <= CSNA2T.CHUNK_SIZE:
-            return (image_data,)
-        # Split the data into chunks of 384 * 255, with the final chunk containing any leftovers
-        datas = []
-        all_data = []
-        for pixel_index in range(len(image_data)):
-            if pixel_index % CSNA2T.CHUNK_SIZE == 0 and datas:
-                all_data.append(tuple(datas))
-                datas = []
-            datas.append(image_data[pixel_index])
-        if datas:
-            all_data.append(datas)
-        return tuple(all_data)
-
-
-async def user_in_dialout() -> bool:
-    proc = await create_subprocess_shell("groups", stdout=PIPE, stderr=STDOUT)
-    out, err = await proc.communicate()
-    return "dialout" in out.decode().split()
+        image_data: PackedBitmap,
+    ) -> typing.Tuple[memoryview, ...]:
+        # Split the data into row aligned chunks of up to 255 rows, with the final chunk containing any leftovers
+        return image_data.chunks(max_rows=CSNA2T.CHUNK_HEIGHT)
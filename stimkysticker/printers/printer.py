@@ -1,16 +1,46 @@
+import asyncio
+import functools
+import time
 import typing
 from abc import ABC, abstractmethod
 from pathlib import Path
 from asyncio import Lock
 
-from ..labels.label import Label
+from loguru import logger
+from PIL import Image
+
+from ..cache.render_cache import RenderCache, RenderedLabel, RenderKey
+from ..labels.label import ImageSource, Label
+from ..labels.packing import STICKER_GAP_PX, compose_page, pack_pages
+from ..media import DownloadedImage, PrintSource, label_source, source_path
+from ..metrics import PRINTS, STAGE_SECONDS
+from ..render_pool import RenderPool
 from ..utils.exceptions import StimkyStickerException
+from ..utils.utils import user_in_group
+
+T = typing.TypeVar("T")
+# What each sticker of a batch came to, the label it was printed on or what stopped it
+BatchResult = typing.Union[RenderedLabel, BaseException]
 
 
 class Printer(ABC):
     SUPPORTED_LABELS: typing.Tuple[Label]
     name: str
-    _printer_lock: Lock = Lock()
+    # Rendering runs inline unless a pool is attached
+    render_pool: typing.Optional[RenderPool] = None
+    # Every render is redone unless a cache is attached
+    render_cache: typing.Optional[RenderCache] = None
+    # Group that owns the device node, the user has to be in it to print
+    device_group: typing.Optional[str] = None
+
+    gamma_correction: float = 1.8
+    background_color: str = "white"
+    dither: str = "floyd-steinberg"
+    resampling: str = "quality"
+    # Also write every formatted label to disk, for history and previews
+    save_formatted: bool = False
+    # Stickers side by side when several are printed together on a continuous label
+    batch_columns: int = 1
 
     def __init__(self, using_label: Label):
         self._label = using_label
@@ -18,15 +48,225 @@ class Printer(ABC):
             raise StimkyPrinterException(
                 f"Label {self._label.name} is not supported by printer {self.name}"
             )
+        # Each printer serializes its own jobs so several devices can print at once
+        self._printer_lock = Lock()
+
+    @property
+    def label(self) -> Label:
+        return self._label
+
+    @property
+    def busy(self) -> bool:
+        return self._printer_lock.locked()
+
+    @property
+    @abstractmethod
+    def device(self) -> Path:
+        ...
+
+    def check_access(self) -> None:
+        if self.device_group is None or user_in_group(self.device_group):
+            return
+        raise StimkyPrinterException(
+            f"You are not part of the {self.device_group} group needed for {self.name}. Add "
+            f"yourself with 'sudo usermod -aG {self.device_group} $USER'"
+        )
+
+    async def close(self) -> None:
+        """
+        Let go of the device, for printers that hold it open between jobs
+        """
 
-    async def print(self, image_file: Path) -> Path:
+    @property
+    def can_batch(self) -> bool:
+        """
+        Only continuous labels have room for more than one sticker
+        """
+        return self._label.height_px is None
+
+    async def print(self, image_file: PrintSource) -> RenderedLabel:
+        waiting = time.perf_counter()
         async with self._printer_lock:
+            STAGE_SECONDS.observe(
+                time.perf_counter() - waiting, stage="lock_wait", printer=self.name
+            )
             return await self._print(image_file=image_file)
 
+    async def print_batch(
+        self, image_files: typing.Sequence[PrintSource]
+    ) -> typing.List[BatchResult]:
+        """
+        Print several stickers packed onto as few continuous labels as they fit on, each label
+        is a single job with one feed and one cut
+        :return: The label each sticker was printed on, or the exception that stopped it, in
+        the same order. A sticker that fails to render or whose label fails to send doesn't
+        take down the ones already printed
+        """
+        waiting = time.perf_counter()
+        async with self._printer_lock:
+            STAGE_SECONDS.observe(
+                time.perf_counter() - waiting, stage="lock_wait", printer=self.name
+            )
+            return await self._print_batch(image_files=image_files)
+
+    async def render(self, func: typing.Callable[..., T], *args, **kwargs) -> T:
+        if self.render_pool is None:
+            return func(*args, **kwargs)
+        return await self.render_pool.run(func, *args, **kwargs)
+
+    async def prepare(self, image_file: PrintSource) -> RenderedLabel:
+        """
+        Turn a source image into the data this printer needs, reusing a cached render if the
+        same source was already rendered with the same settings
+        """
+        if self.render_cache is None:
+            return await self._render_label(image_file=image_file)
+        key = await self.render_key(image_file=image_file)
+        if key in self.render_cache.in_flight:
+            logger.debug(
+                f"Waiting on an identical render of {image_file} on {self.name}"
+            )
+        return await self.render_cache.in_flight.run(
+            key=key,
+            func=functools.partial(self._cached_render, key=key, image_file=image_file),
+        )
+
+    async def render_key(self, image_file: PrintSource) -> RenderKey:
+        if isinstance(image_file, DownloadedImage):
+            source_hash = await self.render(
+                RenderCache.hash_bytes, data=image_file.data
+            )
+        else:
+            source_hash = await self.render(RenderCache.hash_file, path=image_file)
+        return RenderKey(
+            source_hash=source_hash,
+            printer=self.name,
+            label=self._label.name,
+            gamma_correction=self.gamma_correction,
+            background_color=self.background_color,
+            dither=self.dither,
+            resampling=self.resampling,
+        )
+
+    async def _cached_render(
+        self, key: RenderKey, image_file: PrintSource
+    ) -> RenderedLabel:
+        cached = self.render_cache.get(key=key)
+        if cached is not None:
+            logger.debug(f"Render cache hit for {image_file} on {self.name}")
+            return cached
+        rendered = await self._render_label(image_file=image_file)
+        return self.render_cache.put(key=key, rendered=rendered)
+
+    async def _print(self, image_file: PrintSource) -> RenderedLabel:
+        rendered = await self.prepare(image_file=image_file)
+        with STAGE_SECONDS.time(stage="send", printer=self.name):
+            if self.render_cache is None:
+                await self.send(rendered=rendered)
+            else:
+                with self.render_cache.pin(rendered=rendered):
+                    await self.send(rendered=rendered)
+        PRINTS.inc(printer=self.name)
+        return rendered
+
+    async def _print_batch(
+        self, image_files: typing.Sequence[PrintSource]
+    ) -> typing.List[BatchResult]:
+        if not self.can_batch:
+            raise StimkyPrinterException(
+                f"{self._label.name} labels on {self.name} have room for one sticker only"
+            )
+        with STAGE_SECONDS.time(stage="render", printer=self.name):
+            renders = await asyncio.gather(
+                *(
+                    self._batch_sticker(image_file=image_file)
+                    for image_file in image_files
+                ),
+                return_exceptions=True,
+            )
+        results: typing.List[typing.Optional[BatchResult]] = [
+            render if isinstance(render, BaseException) else None for render in renders
+        ]
+        # Only the stickers that rendered are packed, indexes point back into results
+        indexes = [index for index, result in enumerate(results) if result is None]
+        stickers = [renders[index] for index in indexes]
+        pages = pack_pages(
+            sizes=[sticker.size for sticker in stickers],
+            width=self._label.width_px,
+            max_height=self._label.height_px_max,
+        )
+        for number, page in enumerate(pages):
+            try:
+                image = await self.render(
+                    compose_page,
+                    stickers=stickers,
+                    page=page,
+                    color=self.background_color,
+                )
+                with STAGE_SECONDS.time(stage="rasterize", printer=self.name):
+                    device_data = await self._rasterize(image=image)
+                rendered = RenderedLabel(device_data=device_data, image=image)
+                with STAGE_SECONDS.time(stage="send", printer=self.name):
+                    await self.send(rendered=rendered)
+            except Exception as e:
+                # The printer is likely in trouble, don't try the labels after this one either
+                for unsent in pages[number:]:
+                    for placement in unsent.placements:
+                        results[indexes[placement.index]] = e
+                break
+            PRINTS.inc(amount=len(page.placements), printer=self.name)
+            for placement in page.placements:
+                results[indexes[placement.index]] = rendered
+        logger.debug(
+            f"Printed {sum(isinstance(result, RenderedLabel) for result in results)} of "
+            f"{len(results)} stickers on {len(pages)} labels on {self.name}"
+        )
+        return results
+
+    async def _batch_sticker(self, image_file: PrintSource) -> Image.Image:
+        if self.batch_columns == 1:
+            # Full width, the same as printing it alone, so cached and look-ahead renders count
+            rendered = await self.prepare(image_file=image_file)
+            if rendered.image is not None:
+                return rendered.image
+        width = (self._label.width_px + STICKER_GAP_PX) // self.batch_columns
+        return await self._render_sticker(
+            image=label_source(image_file), width=width - STICKER_GAP_PX
+        )
+
+    async def _rendered(
+        self, image_file: PrintSource, image: Image.Image, device_data: bytes
+    ) -> RenderedLabel:
+        formatted_image = None
+        if self.save_formatted:
+            formatted_image = await self.render(
+                Label.save_formatted, pil_img=image, source=source_path(image_file)
+            )
+        return RenderedLabel(
+            device_data=device_data, image=image, formatted_image=formatted_image
+        )
+
     @abstractmethod
-    async def _print(self, image_file: Path) -> Path:
+    async def _render_label(self, image_file: PrintSource) -> RenderedLabel:
         ...
 
+    @abstractmethod
+    async def _render_sticker(self, image: ImageSource, width: int) -> Image.Image:
+        """
+        Render a source to the given width, as long as it needs to be on a continuous label
+        """
+        ...
+
+    @abstractmethod
+    async def _rasterize(self, image: Image.Image) -> bytes:
+        """
+        Turn a formatted label into the data sent to the device
+        """
+        ...
+
+    @abstractmethod
+    async def send(self, rendered: RenderedLabel) -> None:
+        ...
 
 
 class StimkyPrinterException(StimkyStickerException):
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import typing
+from pathlib import Path
+
+from attr import dataclass
+from PIL import Image
+
+# Pillow packs "1" images with white as a set bit, thermal printers want black as a set bit
+_INVERT_TABLE = bytes(0xFF - value for value in range(256))
+
+
+@dataclass(frozen=True)
+class PackedBitmap:
+    """
+    A 1-bit image packed MSB first into one contiguous buffer, one set bit per black dot.
+    Every row starts on a byte boundary so rows can be handed out without copying
+    """
+
+    data: bytes
+    width_px: int
+    height_px: int
+
+    @property
+    def row_bytes(self) -> int:
+        return (self.width_px + 7) // 8
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def chunks(self, max_rows: int) -> typing.Tuple[memoryview, ...]:
+        """
+        Split the bitmap into row aligned views of up to max_rows rows each
+        :param max_rows: The maximum amount of rows per chunk
+        :return: Zero-copy views into the packed data
+        """
+        if max_rows < 1:
+            raise ValueError(f"max_rows must be at least 1, got {max_rows}")
+        view = memoryview(self.data)
+        chunk_size = max_rows * self.row_bytes
+        return tuple(
+            view[offset : offset + chunk_size]
+            for offset in range(0, len(self.data), chunk_size)
+        )
+
+    def to_image(self) -> Image.Image:
+        padded_width = self.row_bytes * 8
+        image = Image.frombytes(
+            "1", (padded_width, self.height_px), self.data.translate(_INVERT_TABLE)
+        )
+        if padded_width != self.width_px:
+            image = image.crop((0, 0, self.width_px, self.height_px))
+        return image
+
+    @classmethod
+    def from_buffer(cls, data: bytes, width_px: int) -> PackedBitmap:
+        row_bytes = (width_px + 7) // 8
+        if len(data) % row_bytes:
+            raise ValueError(
+                f"Bitmap data of {len(data)} bytes is not a whole number of {row_bytes} byte rows"
+            )
+        return cls(data=data, width_px=width_px, height_px=len(data) // row_bytes)
+
+    @classmethod
+    def from_file(cls, image_filepath: Path) -> PackedBitmap:
+        with Image.open(image_filepath) as image:
+            return cls.from_image(image=image)
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> PackedBitmap:
+        """
+        Pack an image as is, converting it to 1-bit first if needed.
+        Widths that aren't a multiple of 8 get clear padding bits at the end of every row, so
+        each row still starts on a byte boundary like the printer expects
+        """
+        image = image.convert("1")
+        width, height = image.size
+        if width % 8:
+            # Pad with white so the row padding bits stay clear once inverted
+            padded = Image.new("1", ((width + 7) // 8 * 8, height), 1)
+            padded.paste(image, (0, 0))
+            image = padded
+        return cls(
+            data=image.tobytes().translate(_INVERT_TABLE),
+            width_px=width,
+            height_px=height,
+        )
@@ -0,0 +1,160 @@
+import asyncio
+import time
+import typing
+from asyncio.streams import StreamWriter
+from pathlib import Path
+
+from loguru import logger
+from serial import SerialException
+from serial_asyncio import open_serial_connection
+
+from .printer import StimkyPrinterException
+
+# 8N1 framing puts a start and a stop bit around every byte
+BITS_PER_BYTE = 10
+
+
+def _skip(
+    datas: typing.Iterable[typing.Union[bytes, memoryview]], count: int
+) -> typing.Iterator[memoryview]:
+    """
+    :return: Views of datas without their first count bytes
+    """
+    for data in datas:
+        if count >= len(data):
+            count -= len(data)
+            continue
+        yield memoryview(data)[count:]
+        count = 0
+
+
+class SerialSession:
+    """
+    A long-lived serial connection to a printer.
+
+    drain() only hands the data to the OS, so writes are paced from the baud rate instead: the
+    session keeps track of when the bytes it has written will have left the wire and never lets
+    more than max_in_flight bytes be outstanding.
+
+    If the connection drops part way through a write, it is reopened and the write picks up
+    from the first byte that wasn't handed to the OS yet. Starting over would print the raster
+    rows that already went out a second time
+    """
+
+    def __init__(
+        self,
+        uart_dev: Path,
+        baud_rate: int,
+        init_sequence: typing.Tuple[bytes, ...] = (),
+        max_in_flight: int = 256,
+        retries: int = 1,
+    ):
+        self.uart_dev = uart_dev
+        self.baud_rate = baud_rate
+        self.init_sequence = init_sequence
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+
+        self._writer: typing.Optional[StreamWriter] = None
+        self._initialized: bool = False
+        self._busy_until: float = 0.0
+        # Bytes handed to the OS since the session was created
+        self._written: int = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    @property
+    def byte_time(self) -> float:
+        return BITS_PER_BYTE / self.baud_rate
+
+    @property
+    def bytes_in_flight(self) -> int:
+        remaining = self._busy_until - time.monotonic()
+        return max(0, int(remaining / self.byte_time))
+
+    async def write(self, *datas: typing.Union[bytes, memoryview]) -> None:
+        """
+        Write datas as one command, a command is never split by the init sequence
+        """
+        async with self._lock:
+            sent = 0
+            for attempt in range(self.retries + 1):
+                try:
+                    # Resending the init sequence now would land in the middle of the command,
+                    # it goes out before the next one instead
+                    await self._connect(initialize=not sent)
+                    start = self._written
+                    try:
+                        for data in _skip(datas, count=sent):
+                            await self._paced_write(data=data)
+                    finally:
+                        sent += self._written - start
+                    return
+                except (SerialException, OSError) as e:
+                    logger.warning(
+                        f"Serial write to {self.uart_dev} failed after {sent} bytes ({e}), "
+                        f"reconnecting"
+                    )
+                    await self._disconnect()
+                    if attempt == self.retries:
+                        raise StimkyPrinterException(
+                            f"Unable to write to serial device {self.uart_dev}: {e}"
+                        )
+
+    async def flush(self) -> None:
+        """
+        Wait until every byte written so far has been sent out of the UART
+        """
+        remaining = self._busy_until - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self.connected:
+                logger.debug(f"Closing serial session on {self.uart_dev}")
+            await self.flush()
+            await self._disconnect()
+
+    async def _connect(self, initialize: bool = True) -> None:
+        if not self.connected:
+            logger.debug(
+                f"Opening serial session on {self.uart_dev} at {self.baud_rate}"
+            )
+            _, self._writer = await open_serial_connection(
+                url=str(self.uart_dev), baudrate=self.baud_rate
+            )
+            self._initialized = False
+            self._busy_until = time.monotonic()
+        if initialize and not self._initialized:
+            if self.init_sequence:
+                await self._paced_write(data=b"".join(self.init_sequence))
+            self._initialized = True
+
+    async def _disconnect(self) -> None:
+        writer, self._writer = self._writer, None
+        self._initialized = False
+        if writer is None:
+            return
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except (SerialException, OSError) as e:
+            logger.debug(f"Ignoring error while closing {self.uart_dev}: {e}")
+
+    async def _paced_write(self, data: typing.Union[bytes, memoryview]) -> None:
+        view = memoryview(data)
+        for offset in range(0, len(view), self.max_in_flight):
+            piece = view[offset : offset + self.max_in_flight]
+            # Wait until there is room for this piece in the flight window
+            overflow = self.bytes_in_flight + len(piece) - self.max_in_flight
+            if overflow > 0:
+                await asyncio.sleep(overflow * self.byte_time)
+            self._writer.write(piece)
+            await self._writer.drain()
+            self._written += len(piece)
+            now = time.monotonic()
+            self._busy_until = max(now, self._busy_until) + len(piece) * self.byte_time
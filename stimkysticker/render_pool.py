@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import typing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from attr import dataclass
+from loguru import logger
+
+from .utils.exceptions import StimkyStickerException
+
+RENDER_POOL_KINDS = ("thread", "process")
+
+T = typing.TypeVar("T")
+
+
+@dataclass(frozen=True)
+class RenderPoolStats:
+    kind: str
+    workers: int
+    max_queued: int
+    running: int
+    queued: int
+    completed: int
+    failed: int
+    rejected: int
+
+    @property
+    def utilization(self) -> float:
+        return self.running / self.workers
+
+    @property
+    def queue_fill(self) -> float:
+        if not self.max_queued:
+            return 1.0 if self.queued else 0.0
+        return self.queued / self.max_queued
+
+    def __str__(self) -> str:
+        return (
+            f"{self.running}/{self.workers} {self.kind} workers busy, "
+            f"{self.queued}/{self.max_queued} jobs queued"
+        )
+
+
+class RenderPool:
+    """
+    Runs CPU heavy image work in a thread or process pool so it never blocks the event loop.
+    At most workers + max_queued jobs are accepted at once, anything above that is rejected
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 2, max_queued: int = 8):
+        if kind not in RENDER_POOL_KINDS:
+            raise ValueError(
+                f"{kind} is not a valid render pool. Valid pools are {', '.join(RENDER_POOL_KINDS)}"
+            )
+        if workers < 1:
+            raise ValueError(f"A render pool needs at least 1 worker, got {workers}")
+        self.kind = kind
+        self.workers = workers
+        self.max_queued = max(0, max_queued)
+        self._executor: typing.Optional[Executor] = None
+        self._accepted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    @property
+    def stats(self) -> RenderPoolStats:
+        return RenderPoolStats(
+            kind=self.kind,
+            workers=self.workers,
+            max_queued=self.max_queued,
+            # The executor hands jobs to idle workers in order, so anything past the
+            # worker count is waiting in its queue
+            running=min(self._accepted, self.workers),
+            queued=max(0, self._accepted - self.workers),
+            completed=self._completed,
+            failed=self._failed,
+            rejected=self._rejected,
+        )
+
+    @property
+    def full(self) -> bool:
+        return self._accepted >= self.workers + self.max_queued
+
+    async def run(self, func: typing.Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run func in the pool. With a process pool func and its arguments have to be picklable
+        :return: Whatever func returns
+        """
+        if self.full:
+            self._rejected += 1
+            raise StimkyRenderPoolException(
+                f"The render queue is full ({self.stats}), please try again in a bit"
+            )
+        loop = asyncio.get_running_loop()
+        future = self._get_executor().submit(functools.partial(func, *args, **kwargs))
+        self._accepted += 1
+        # Counted off once the executor is done with it, a cancelled caller doesn't stop a job
+        # that is already running
+        future.add_done_callback(
+            lambda done: self._call_soon(loop, functools.partial(self._finished, done))
+        )
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _finished(self, future: concurrent.futures.Future) -> None:
+        self._accepted -= 1
+        if future.cancelled():
+            return
+        if future.exception() is None:
+            self._completed += 1
+        else:
+            self._failed += 1
+
+    @staticmethod
+    def _call_soon(loop: asyncio.AbstractEventLoop, callback: typing.Callable) -> None:
+        # Runs on whichever thread finished the job
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            # The loop has already been closed on shutdown
+            pass
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            logger.debug(
+                f"Starting {self.kind} render pool with {self.workers} workers"
+            )
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="render"
+                )
+        return self._executor
+
+
+class StimkyRenderPoolException(StimkyStickerException):
+    def __init__(self, message: str):
+        self.message = message
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import math
+import time
+import typing
+
+from attr import dataclass, field
+from loguru import logger
+
+from .labels.label import Label
+from .media import PrintSource
+from .metrics import STAGE_SECONDS
+from .printers.printer import Printer
+from .utils.exceptions import StimkyStickerException
+
+
+@dataclass(eq=False)
+class PrintJob:
+    user_id: int
+    image_file: PrintSource
+    priority: bool
+    submitted: float
+    # Only print on printers loaded with one of these labels, any printer if empty
+    labels: typing.Tuple[Label, ...] = ()
+    result: asyncio.Future = field(
+        factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    started: typing.Optional[float] = None
+    printer: typing.Optional[Printer] = None
+    # Render started ahead of time, while other jobs print
+    prepared: typing.Optional[asyncio.Task] = None
+
+    def accepts(self, printer: Printer) -> bool:
+        return not self.labels or printer.label in self.labels
+
+
+class PrintScheduler:
+    """
+    Feeds print jobs to a pool of printers, each printer prints one job at a time.
+
+    Jobs from the admin go through a priority lane, everyone else is served round-robin by user
+    id so one user sending a pile of stickers can't starve the rest of the queue. A new job
+    wakes the idle compatible printer that has spent the least time printing.
+
+    The next look_ahead jobs in line are rendered while the printers are busy, so a printer
+    that frees up finds its next job waiting in the render cache.
+
+    Once at least batch_min_queue jobs are waiting, a printer with continuous labels takes up
+    to batch_size of them at once and packs them onto shared labels. Every job still gets its
+    own result, so each user is charged for their own sticker.
+
+    The printers can be replaced while running, a printer that is taken out finishes the job
+    it is on and is closed before the new ones start
+    """
+
+    def __init__(
+        self,
+        printers: typing.Sequence[Printer],
+        max_jobs: int = 32,
+        admin_id: typing.Optional[int] = None,
+        initial_print_time: float = 15.0,
+        smoothing: float = 0.3,
+        look_ahead: int = 2,
+        batch_size: int = 1,
+        batch_min_queue: int = 4,
+    ):
+        if not printers:
+            raise ValueError("The scheduler needs at least one printer")
+        self.printers = tuple(printers)
+        self.max_jobs = max_jobs
+        self.admin_id = admin_id
+        self.smoothing = smoothing
+        self.average_print_time = initial_print_time
+        self.look_ahead = look_ahead
+        self.batch_size = batch_size
+        self.batch_min_queue = batch_min_queue
+
+        self._priority: typing.Deque[PrintJob] = collections.deque()
+        # Insertion order is the round-robin order, a user moves to the back once served
+        self._lanes: typing.OrderedDict[
+            int, typing.Deque[PrintJob]
+        ] = collections.OrderedDict()
+        self._current: typing.Dict[Printer, PrintJob] = {}
+        self._busy_time: typing.Dict[Printer, float] = {p: 0.0 for p in self.printers}
+        self._idle: typing.Dict[Printer, asyncio.Event] = {}
+        self._tasks: typing.Dict[Printer, asyncio.Task] = {}
+        # Set whenever the printers change or a printer's loop ends
+        self._printers_changed: typing.Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._priority) + sum(len(lane) for lane in self._lanes.values())
+
+    @property
+    def full(self) -> bool:
+        return len(self) >= self.max_jobs
+
+    @property
+    def printing(self) -> int:
+        return len(self._current)
+
+    def submit(
+        self,
+        user_id: int,
+        image_file: PrintSource,
+        labels: typing.Tuple[Label, ...] = (),
+    ) -> PrintJob:
+        if self.full:
+            raise StimkySchedulerException(
+                f"The print queue is full ({self.max_jobs} jobs), please try again in a bit"
+            )
+        job = PrintJob(
+            user_id=user_id,
+            image_file=image_file,
+            priority=user_id == self.admin_id,
+            submitted=time.monotonic(),
+            labels=labels,
+        )
+        if not any(job.accepts(printer) for printer in self.printers):
+            raise StimkySchedulerException(
+                f"None of the printers are loaded with "
+                f"{' or '.join(label.name for label in labels)} labels"
+            )
+        if job.priority:
+            self._priority.append(job)
+        else:
+            self._lanes.setdefault(user_id, collections.deque()).append(job)
+        logger.debug(
+            f"Queued print for {user_id} at position {self.position(job)} of {len(self)}"
+        )
+        self._wake_printer(job=job)
+        self._prepare_ahead()
+        return job
+
+    def position(self, job: PrintJob) -> typing.Optional[int]:
+        """
+        :return: How many jobs will print before this one, 0 if it is up next. None once it
+        has left the queue to print
+        """
+        for index, queued in enumerate(self._pending_order()):
+            if queued is job:
+                return index
+        return None
+
+    def estimated_wait(self, job: PrintJob) -> float:
+        """
+        :return: Roughly how many seconds until this job starts printing
+        """
+        position = self.position(job)
+        if position is None:
+            return 0.0
+        compatible = [p for p in self.printers if job.accepts(p)]
+        rounds = math.floor(position / len(compatible))
+        wait = rounds * self.average_print_time
+        if all(printer in self._current for printer in compatible):
+            # Everything that could take this job is busy, wait for the first to free up
+            now = time.monotonic()
+            wait += min(
+                max(0.0, self.average_print_time - (now - self._current[p].started))
+                for p in compatible
+            )
+        return wait
+
+    def replace_printers(self, printers: typing.Sequence[Printer]) -> None:
+        """
+        Swap in a new set of printers. Printers that are kept carry on, the ones taken out
+        finish their current job first and the new ones only start once they have
+        """
+        if not printers:
+            raise ValueError("The scheduler needs at least one printer")
+        retired = [printer for printer in self.printers if printer not in printers]
+        self.printers = tuple(printers)
+        for printer in self.printers:
+            self._busy_time.setdefault(printer, 0.0)
+        for printer in retired:
+            if printer in self._idle:
+                # Wake it so it notices it's been taken out
+                self._idle[printer].set()
+        self._fail_unprintable()
+        if self._printers_changed is not None:
+            self._printers_changed.set()
+
+    async def run(self) -> None:
+        self._printers_changed = asyncio.Event()
+        try:
+            while True:
+                self._printers_changed.clear()
+                # Printers taken out may still be on a job for the same device
+                if all(printer in self.printers for printer in self._tasks):
+                    for printer in self.printers:
+                        if printer not in self._tasks:
+                            self._tasks[printer] = asyncio.create_task(
+                                self._run_printer(printer)
+                            )
+                await self._printers_changed.wait()
+        finally:
+            for task in self._tasks.values():
+                task.cancel()
+
+    async def _run_printer(self, printer: Printer) -> None:
+        self._idle[printer] = asyncio.Event()
+        try:
+            await self._print_jobs(printer=printer)
+        finally:
+            del self._idle[printer]
+            try:
+                if printer not in self.printers:
+                    del self._busy_time[printer]
+                    logger.debug(f"{printer.name} on {printer.device} was taken out")
+                    # Before its replacement can start and open the same device
+                    await printer.close()
+            finally:
+                del self._tasks[printer]
+                self._printers_changed.set()
+
+    async def _print_jobs(self, printer: Printer) -> None:
+        while printer in self.printers:
+            job = await self._next_job(printer=printer)
+            if job is None:
+                return
+            if job.result.cancelled():
+                logger.debug(f"Skipping cancelled print for {job.user_id}")
+                continue
+            jobs = [job, *self._take_batch(printer=printer)]
+            self._current[printer] = job
+            started = time.monotonic()
+            for batched in jobs:
+                batched.printer = printer
+                batched.started = started
+                STAGE_SECONDS.observe(
+                    started - batched.submitted, stage="queue", printer=printer.name
+                )
+            self._prepare_ahead()
+            try:
+                if len(jobs) == 1:
+                    results = [await printer.print(image_file=job.image_file)]
+                else:
+                    results = await printer.print_batch(
+                        image_files=[batched.image_file for batched in jobs]
+                    )
+            except Exception as e:
+                results = [e] * len(jobs)
+            finally:
+                self._busy_time[printer] += time.monotonic() - started
+                del self._current[printer]
+            printed = sum(not isinstance(result, BaseException) for result in results)
+            if printed:
+                # Per sticker, so wait estimates stay right whether or not jobs were batched
+                self._record_print_time((time.monotonic() - started) / printed)
+            for batched, result in zip(jobs, results):
+                if batched.result.done():
+                    continue
+                if isinstance(result, BaseException):
+                    batched.result.set_exception(result)
+                else:
+                    batched.result.set_result(result)
+
+    async def _next_job(self, printer: Printer) -> typing.Optional[PrintJob]:
+        """
+        :return: The next job for this printer, None once it has been taken out
+        """
+        idle = self._idle[printer]
+        while printer in self.printers:
+            job = self._take(printer=printer)
+            if job is not None:
+                return job
+            idle.clear()
+            await idle.wait()
+        return None
+
+    def _take(self, printer: Printer) -> typing.Optional[PrintJob]:
+        for job in self._priority:
+            if job.accepts(printer):
+                self._priority.remove(job)
+                return job
+        for user_id, lane in self._lanes.items():
+            # Each user's jobs print in order, so only the head of a lane is up for grabs
+            if lane[0].accepts(printer):
+                job = lane.popleft()
+                del self._lanes[user_id]
+                if lane:
+                    self._lanes[user_id] = lane
+                return job
+        return None
+
+    def _take_batch(self, printer: Printer) -> typing.List[PrintJob]:
+        """
+        More jobs to print together with the one the printer just took, none unless batching
+        is on, the printer has continuous labels and the queue is backed up
+        """
+        batch: typing.List[PrintJob] = []
+        if (
+            self.batch_size < 2
+            or not printer.can_batch
+            or len(self) + 1 < self.batch_min_queue
+        ):
+            return batch
+        while len(batch) + 1 < self.batch_size:
+            job = self._take(printer=printer)
+            if job is None:
+                break
+            if not job.result.cancelled():
+                batch.append(job)
+        return batch
+
+    def _wake_printer(self, job: PrintJob) -> None:
+        idle = [
+            printer
+            for printer in self.printers
+            if printer not in self._current and printer in self._idle
+            # A printer that has already been woken will pick up a job of its own
+            and not self._idle[printer].is_set() and job.accepts(printer)
+        ]
+        if idle:
+            least_loaded = min(idle, key=lambda printer: self._busy_time[printer])
+            self._idle[least_loaded].set()
+
+    def _prepare_ahead(self) -> None:
+        for depth, job in enumerate(self._pending_order()):
+            if depth >= self.look_ahead:
+                break
+            if job.prepared is not None or job.result.cancelled():
+                continue
+            # Render for whichever compatible printer is likely to be free first
+            printer = min(
+                (p for p in self.printers if job.accepts(p)),
+                key=lambda p: (p in self._current, self._busy_time[p]),
+            )
+            if printer.render_cache is None:
+                # Without a cache the render would just be thrown away
+                continue
+            job.prepared = asyncio.create_task(
+                printer.prepare(image_file=job.image_file)
+            )
+            job.prepared.add_done_callback(self._prepared)
+
+    @staticmethod
+    def _prepared(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            # The printer renders again when the job comes up, and reports the error then
+            logger.debug(f"Rendering ahead failed: {task.exception()}")
+
+    def _fail_unprintable(self) -> None:
+        """
+        Fail every queued job that none of the printers can take anymore
+        """
+        unprintable = [
+            job
+            for job in self._pending_order()
+            if not any(job.accepts(printer) for printer in self.printers)
+        ]
+        for job in unprintable:
+            if job.priority:
+                self._priority.remove(job)
+            else:
+                lane = self._lanes[job.user_id]
+                lane.remove(job)
+                if not lane:
+                    del self._lanes[job.user_id]
+            if not job.result.done():
+                job.result.set_exception(
+                    StimkySchedulerException(
+                        f"None of the printers are loaded with "
+                        f"{' or '.join(label.name for label in job.labels)} labels anymore"
+                    )
+                )
+
+    def _pending_order(self) -> typing.Iterator[PrintJob]:
+        yield from self._priority
+        lanes = [list(lane) for lane in self._lanes.values()]
+        for depth in range(max((len(lane) for lane in lanes), default=0)):
+            for lane in lanes:
+                if depth < len(lane):
+                    yield lane[depth]
+
+    def _record_print_time(self, duration: float) -> None:
+        self.average_print_time += self.smoothing * (duration - self.average_print_time)
+
+
+class StimkySchedulerException(StimkyStickerException):
+    def __init__(self, message: str):
+        self.message = message
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
@@ -0,0 +1,2 @@
+from .client import Exchange, SimulatedClient, SimulatedMedia
+from .load import LoadReport, Scenario, run_load, simulation_config
@@ -0,0 +1,124 @@
+"""
+Run the bot's handlers against simulated Telegram users and emulated printers, to see how
+many stickers an event's hardware can get through and how long people wait for them.
+
+    python -m stimkysticker.simulator [--users 20] [--duration 60] [--rate 1] [--printer ql-570]
+"""
+import asyncio
+import contextlib
+import tempfile
+import typing
+from pathlib import Path
+
+import click
+
+from ..config.configfile import ConfigFile
+from ..printers import PRINTER_DICT
+from .client import SimulatedClient
+from .load import Scenario, run_load, simulation_config, start_emulated_printers
+
+EMULATED_PRINTERS = tuple(name for name in PRINTER_DICT if name != "qldummy")
+
+
+@click.command()
+@click.option("--users", default=20, help="Simulated users")
+@click.option("--duration", default=60.0, help="Seconds users keep sending images")
+@click.option("--ramp-up", default=10.0, help="Seconds until every user has joined")
+@click.option("--rate", default=1.0, help="Images per user per minute")
+@click.option("--photos", default=0.4, help="Share of photos")
+@click.option("--stickers", default=0.5, help="Share of static stickers")
+@click.option("--animated", default=0.1, help="Share of animated stickers")
+@click.option("--unique-media", default=20, help="Distinct images of each kind")
+@click.option(
+    "--printer",
+    "printer_name",
+    type=click.Choice(EMULATED_PRINTERS, case_sensitive=False),
+    default="ql-570",
+)
+@click.option("--label", default=None, help="Label, the printer's first one by default")
+@click.option("--printers", "printer_count", default=1, help="Printers of that type")
+@click.option("--download-speed", default=1.0, help="Download speed in MB/s")
+@click.option(
+    "--download-latency", default=0.2, help="Seconds before a download starts"
+)
+@click.option(
+    "--config",
+    "config_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="Take the bot settings from this config, the printers are always emulated",
+)
+@click.option("--seed", default=0)
+@click.option("--log-level", default="WARNING")
+def main(
+    users: int,
+    duration: float,
+    ramp_up: float,
+    rate: float,
+    photos: float,
+    stickers: float,
+    animated: float,
+    unique_media: int,
+    printer_name: str,
+    label: typing.Optional[str],
+    printer_count: int,
+    download_speed: float,
+    download_latency: float,
+    config_path: typing.Optional[Path],
+    seed: int,
+    log_level: str,
+):
+    scenario = Scenario(
+        users=users,
+        duration=duration,
+        ramp_up=ramp_up,
+        rate=rate,
+        mix=(photos, stickers, animated),
+        unique_media=unique_media,
+        seed=seed,
+    )
+    printer_type = PRINTER_DICT[printer_name.casefold()]
+    labels = {
+        supported.name.casefold(): supported
+        for supported in printer_type.SUPPORTED_LABELS
+    }
+    if label is not None and label.casefold() not in labels:
+        raise click.BadParameter(
+            f"{printer_type.name} supports {', '.join(labels)}", param_hint="--label"
+        )
+    chosen_label = (
+        labels[label.casefold()] if label else printer_type.SUPPORTED_LABELS[0]
+    )
+    base = ConfigFile.from_json(configfile=config_path) if config_path else None
+
+    with tempfile.TemporaryDirectory(prefix="stimky-sim-") as workdir:
+        with contextlib.ExitStack() as stack:
+            printers, emulators = start_emulated_printers(
+                stack=stack,
+                printer_name=printer_name,
+                label=chosen_label,
+                count=printer_count,
+            )
+            client = SimulatedClient(
+                download_bytes_per_second=download_speed * 1_000_000,
+                download_latency=download_latency,
+            )
+            report = asyncio.run(
+                run_load(
+                    config_file=simulation_config(
+                        printers=printers, workdir=Path(workdir), base=base
+                    ),
+                    scenario=scenario,
+                    client=client,
+                    log_level=log_level,
+                )
+            )
+            devices = [f"{emulator.device}" for emulator in emulators]
+        report.printers = {
+            device: emulator.report for device, emulator in zip(devices, emulators)
+        }
+    click.echo(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+import typing
+
+import attr
+from attr import dataclass
+from loguru import logger
+from telethon import events
+from telethon.tl.types import DocumentAttributeAnimated
+
+Handler = typing.Callable[[typing.Any], typing.Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class SimulatedMedia:
+    # Stands in for both Telegram photos and sticker documents
+    id: int
+    data: bytes
+    attributes: typing.Tuple[typing.Any, ...] = ()
+
+
+@dataclass(frozen=True)
+class PeerUser:
+    user_id: int
+
+
+@dataclass(frozen=True)
+class SimulatedMessage:
+    raw_text: str = ""
+    photo: typing.Optional[SimulatedMedia] = None
+    sticker: typing.Optional[SimulatedMedia] = None
+    out: bool = False
+
+    @property
+    def media(self) -> typing.Optional[SimulatedMedia]:
+        return self.photo or self.sticker
+
+
+class SimulatedEvent:
+    """
+    The parts of a telethon NewMessage event the handlers use, replies are collected instead
+    of being sent
+    """
+
+    is_private = True
+
+    def __init__(self, user_id: int, message: SimulatedMessage):
+        self.peer_id = PeerUser(user_id=user_id)
+        self.message = message
+        self.raw_text = message.raw_text
+        self.pattern_match = None
+        self.replies: typing.List[str] = []
+        self.errors: typing.List[str] = []
+
+    async def respond(self, text: str) -> None:
+        self.replies.append(text)
+
+
+@dataclass
+class Exchange:
+    """
+    One message from a simulated user and everything the bot said back to it
+    """
+
+    user_id: int
+    kind: str
+    sent_at: float
+    finished_at: float = 0.0
+    replies: typing.List[str] = attr.Factory(list)
+    # Exceptions that escaped a handler, telethon only logs those
+    errors: typing.List[str] = attr.Factory(list)
+
+    @property
+    def latency(self) -> float:
+        return self.finished_at - self.sent_at
+
+
+class SimulatedClient:
+    """
+    Takes the place of the TelegramClient in main_loop. Handlers register the same way, every
+    message is dispatched in its own task like telethon does, and downloads come out of memory
+    at a simulated bandwidth
+    """
+
+    def __init__(
+        self,
+        download_bytes_per_second: float = 1_000_000,
+        download_latency: float = 0.2,
+        chunk_size: int = 128 * 1024,
+    ):
+        self.download_bytes_per_second = download_bytes_per_second
+        self.download_latency = download_latency
+        self.chunk_size = chunk_size
+        self.flood_sleep_threshold = 0
+        self.handlers: typing.List[typing.Tuple[events.NewMessage, Handler]] = []
+        self.running = asyncio.Event()
+        self._disconnected = asyncio.Event()
+
+    def on(self, event: events.NewMessage) -> typing.Callable[[Handler], Handler]:
+        def register(handler: Handler) -> Handler:
+            self.handlers.append((event, handler))
+            return handler
+
+        return register
+
+    async def run_until_disconnected(self) -> None:
+        self.running.set()
+        await self._disconnected.wait()
+
+    def disconnect(self) -> None:
+        self._disconnected.set()
+
+    async def download_media(self, message: SimulatedMessage, file) -> None:
+        await asyncio.sleep(self.download_latency)
+        data = message.media.data
+        for offset in range(0, len(data), self.chunk_size):
+            chunk = data[offset : offset + self.chunk_size]
+            await asyncio.sleep(len(chunk) / self.download_bytes_per_second)
+            file.write(chunk)
+
+    async def send(
+        self,
+        user_id: int,
+        kind: str,
+        text: str = "",
+        photo: typing.Optional[SimulatedMedia] = None,
+        sticker: typing.Optional[SimulatedMedia] = None,
+    ) -> Exchange:
+        """
+        Deliver a message from a user and wait for every handler it triggers to finish
+        """
+        event = SimulatedEvent(
+            user_id=user_id,
+            message=SimulatedMessage(raw_text=text, photo=photo, sticker=sticker),
+        )
+        exchange = Exchange(user_id=user_id, kind=kind, sent_at=time.monotonic())
+        await asyncio.create_task(self._dispatch(event=event))
+        exchange.finished_at = time.monotonic()
+        exchange.replies.extend(event.replies)
+        exchange.errors.extend(event.errors)
+        return exchange
+
+    async def _dispatch(self, event: SimulatedEvent) -> None:
+        for builder, handler in self.handlers:
+            if not await self._matches(builder=builder, event=event):
+                continue
+            try:
+                await handler(event)
+            except Exception as e:
+                logger.exception(f"Unhandled exception in {handler.__name__}: {e}")
+                event.errors.append(f"{type(e).__name__}: {e}")
+
+    @staticmethod
+    async def _matches(builder: events.NewMessage, event: SimulatedEvent) -> bool:
+        if builder.incoming is not None and builder.incoming == event.message.out:
+            return False
+        if builder.pattern:
+            event.pattern_match = builder.pattern(event.raw_text)
+            if not event.pattern_match:
+                return False
+        if builder.func:
+            result = builder.func(event)
+            if inspect.isawaitable(result):
+                result = await result
+            return bool(result)
+        return True
+
+
+def animated(media: SimulatedMedia) -> SimulatedMedia:
+    return attr.evolve(media, attributes=(DocumentAttributeAnimated(),))
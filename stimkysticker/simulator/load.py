@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import io
+import random
+import statistics
+import time
+import typing
+from pathlib import Path
+
+import attr
+from attr import dataclass
+from PIL import Image, ImageDraw
+
+from ..config.configfile import ConfigFile
+from ..emulators import BrotherQLEmulator, CSNA2TEmulator, EmulatorReport, PtyEmulator
+from ..labels.label import Label
+from ..metrics import STAGE_SECONDS
+from ..printers import PRINTER_DICT
+from ..printers.brotherql.brotherql import BrotherQl
+from ..printers.printer import Printer
+from .client import Exchange, SimulatedClient, SimulatedMedia, animated
+
+KINDS = ("photo", "sticker", "animated")
+# The first reply text that matches decides how a request ended
+OUTCOMES = (
+    ("has printed", "printed"),
+    ("Busy", "busy"),
+    ("Error", "error"),
+    ("Cannot print this", "unprintable"),
+    ("Cannot print", "out of stickers"),
+    ("locked", "locked"),
+)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    users: int = 20
+    # Seconds during which users send, everyone has joined by the end of the ramp up
+    duration: float = 60.0
+    ramp_up: float = 10.0
+    # Images per user per minute, at exponentially distributed intervals
+    rate: float = 1.0
+    # Relative shares of photos, static stickers and animated stickers
+    mix: typing.Tuple[float, float, float] = (0.4, 0.5, 0.1)
+    # Distinct images of each kind, past that users are sending popular ones again
+    unique_media: int = 20
+    seed: int = 0
+
+
+def outcome(exchange: Exchange) -> str:
+    if exchange.errors:
+        return "crashed"
+    for reply in reversed(exchange.replies):
+        for text, name in OUTCOMES:
+            if text in reply:
+                return name
+    return "other"
+
+
+def synthetic_media(kind: str, media_id: int) -> SimulatedMedia:
+    """
+    A photo sized JPEG or a transparent sticker sized WEBP with some shapes on it, the same
+    for the same id
+    """
+    rng = random.Random(media_id)
+    photo = kind == "photo"
+    size = (1280, 960) if photo else (512, 512)
+    image = Image.new("RGB" if photo else "RGBA", size, (255, 255, 255, 0))
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        radius = rng.randrange(16, size[1] // 3)
+        color = tuple(rng.randrange(256) for _ in range(3)) + (255,)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+    buffer = io.BytesIO()
+    if photo:
+        image.save(buffer, format="JPEG", quality=85)
+    else:
+        image.save(buffer, format="WEBP", quality=80)
+    media = SimulatedMedia(id=media_id, data=buffer.getvalue())
+    return animated(media) if kind == "animated" else media
+
+
+class MediaPool:
+    def __init__(self, unique_media: int):
+        self.unique_media = unique_media
+        self._media: typing.Dict[typing.Tuple[str, int], SimulatedMedia] = {}
+
+    def pick(self, kind: str, rng: random.Random) -> typing.Dict[str, SimulatedMedia]:
+        """
+        :return: The photo or sticker keyword for SimulatedClient.send
+        """
+        # Low numbers come up more often, like a few stickers everyone likes
+        index = min(int(rng.paretovariate(1.2)) - 1, self.unique_media - 1)
+        key = (kind, index)
+        if key not in self._media:
+            media_id = (KINDS.index(kind) + 1) * 1_000_000 + index
+            self._media[key] = synthetic_media(kind=kind, media_id=media_id)
+        return {"photo" if kind == "photo" else "sticker": self._media[key]}
+
+
+@dataclass
+class LoadReport:
+    scenario: Scenario
+    duration: float
+    exchanges: typing.List[Exchange]
+    printers: typing.Dict[str, EmulatorReport] = attr.Factory(dict)
+
+    def latencies(
+        self, kind: typing.Optional[str] = None, result: typing.Optional[str] = None
+    ) -> typing.List[float]:
+        return sorted(
+            exchange.latency
+            for exchange in self.exchanges
+            if exchange.kind in KINDS
+            and (kind is None or exchange.kind == kind)
+            and (result is None or outcome(exchange) == result)
+        )
+
+    @property
+    def printed(self) -> int:
+        return len(self.latencies(result="printed"))
+
+    @property
+    def throughput(self) -> float:
+        """
+        Stickers printed per minute
+        """
+        return self.printed / self.duration * 60 if self.duration else 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"{self.scenario.users} users for {self.duration:.0f}s, "
+            f"{self.printed} printed, {self.throughput:.1f} stickers/min",
+            f"{'kind':<10}{'outcome':<17}{'count':>6}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}",
+        ]
+        results = sorted(
+            {(e.kind, outcome(e)) for e in self.exchanges if e.kind in KINDS}
+        )
+        for kind, result in results:
+            latencies = self.latencies(kind=kind, result=result)
+            lines.append(
+                f"{kind:<10}{result:<17}{len(latencies):>6}"
+                + "".join(f"{value:>7.2f}s" for value in _percentiles(latencies))
+            )
+        for stage, printer in sorted(STAGE_SECONDS.counts):
+            lines.append(
+                f"stage {stage}{f' ({printer})' if printer else ''}: "
+                f"{STAGE_SECONDS.count(stage=stage, printer=printer)}x, "
+                f"avg {STAGE_SECONDS.mean(stage=stage, printer=printer):.3f}s"
+            )
+        for device, report in self.printers.items():
+            lines.append(f"{device}: {report.summary()}")
+        return "\n".join(lines)
+
+
+def _percentiles(latencies: typing.List[float]) -> typing.Tuple[float, ...]:
+    if len(latencies) < 2:
+        value = latencies[0] if latencies else 0.0
+        return value, value, value, value
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return cuts[49], cuts[89], cuts[98], latencies[-1]
+
+
+def start_emulated_printers(
+    stack: contextlib.ExitStack, printer_name: str, label: Label, count: int
+) -> typing.Tuple[typing.List[Printer], typing.List[PtyEmulator]]:
+    """
+    Printers of one type, each talking to its own emulator. The emulators stop with the stack
+    """
+    printer_type = PRINTER_DICT[printer_name.casefold()]
+    printers, emulators = [], []
+    for _ in range(count):
+        if issubclass(printer_type, BrotherQl):
+            emulator = BrotherQLEmulator(
+                loaded_media=(label.width_mm, label.height_mm or 0), throttle=True
+            )
+        else:
+            emulator = CSNA2TEmulator()
+        stack.enter_context(emulator)
+        emulators.append(emulator)
+        printers.append(printer_type(label, device=emulator.device))
+    return printers, emulators
+
+
+def simulation_config(
+    printers: typing.List[Printer],
+    workdir: Path,
+    base: typing.Optional[ConfigFile] = None,
+) -> ConfigFile:
+    """
+    The bot settings from base, or the defaults, with the emulated printers and everything it
+    writes kept inside workdir
+    """
+    overrides = dict(
+        printer=printers[0],
+        label=printers[0].label,
+        extra_printers=tuple(printers[1:]),
+        cache_dir=workdir / "cache",
+        user_db=workdir / "users.db",
+        journal_path=workdir / "prints.jsonl",
+        metrics_port=0,
+    )
+    if base is not None:
+        return attr.evolve(base, **overrides)
+    return ConfigFile(
+        api_id="0",
+        api_hash="",
+        bot_token="",
+        password="stimky",
+        admin_id=0,
+        fursona_name="Simulator",
+        **overrides,
+    )
+
+
+async def run_load(
+    config_file: ConfigFile,
+    scenario: Scenario,
+    client: typing.Optional[SimulatedClient] = None,
+    log_level: str = "WARNING",
+) -> LoadReport:
+    """
+    Run the bot against simulated users until the scenario is over and every request they
+    made has been answered
+    """
+    from ..__main__ import main_loop
+
+    client = client or SimulatedClient()
+    bot = asyncio.create_task(
+        main_loop(config_file=config_file, client=client, log_level=log_level)
+    )
+    running = asyncio.create_task(client.running.wait())
+    await asyncio.wait((bot, running), return_when=asyncio.FIRST_COMPLETED)
+    if bot.done():
+        running.cancel()
+        # Startup failed, let the reason out
+        await bot
+    pool = MediaPool(unique_media=scenario.unique_media)
+    start = time.monotonic()
+    try:
+        per_user = await asyncio.gather(
+            *(
+                _simulated_user(
+                    client=client,
+                    user_id=1000 + number,
+                    scenario=scenario,
+                    pool=pool,
+                    password=config_file.password,
+                    rng=random.Random(scenario.seed * 100_003 + number),
+                    deadline=start + scenario.duration,
+                )
+                for number in range(scenario.users)
+            )
+        )
+    finally:
+        client.disconnect()
+        await bot
+    return LoadReport(
+        scenario=scenario,
+        duration=time.monotonic() - start,
+        exchanges=[exchange for exchanges in per_user for exchange in exchanges],
+    )
+
+
+async def _simulated_user(
+    client: SimulatedClient,
+    user_id: int,
+    scenario: Scenario,
+    pool: MediaPool,
+    password: str,
+    rng: random.Random,
+    deadline: float,
+) -> typing.List[Exchange]:
+    await asyncio.sleep(rng.uniform(0, scenario.ramp_up))
+    exchanges = [
+        await client.send(user_id=user_id, kind="start", text="/start"),
+        await client.send(user_id=user_id, kind="unlock", text=password),
+    ]
+    # Open loop, people don't wait for their last sticker before sending the next one
+    requests = []
+    while True:
+        wait = rng.expovariate(scenario.rate / 60)
+        if time.monotonic() + wait >= deadline:
+            break
+        await asyncio.sleep(wait)
+        kind = rng.choices(KINDS, weights=scenario.mix)[0]
+        requests.append(
+            asyncio.create_task(
+                client.send(user_id=user_id, kind=kind, **pool.pick(kind=kind, rng=rng))
+            )
+        )
+    exchanges.extend(await asyncio.gather(*requests))
+    return exchanges
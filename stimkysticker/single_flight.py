@@ -0,0 +1,44 @@
+import asyncio
+import typing
+
+K = typing.TypeVar("K", bound=typing.Hashable)
+T = typing.TypeVar("T")
+
+
+class SingleFlight(typing.Generic[K, T]):
+    """
+    Runs at most one coroutine per key at a time, anyone asking for a key that is already in
+    flight waits on the same result instead of doing the work again.
+
+    The work runs as its own task, so it still finishes and can be reused if the caller that
+    started it is cancelled
+    """
+
+    def __init__(self):
+        self._in_flight: typing.Dict[K, asyncio.Task] = {}
+        self.started = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._in_flight
+
+    async def run(self, key: K, func: typing.Callable[[], typing.Awaitable[T]]) -> T:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key=key, task=done))
+            self.started += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: K, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as seen, every waiter has already been handed it
+            task.exception()
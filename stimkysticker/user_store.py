@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import sqlite3
+import time
+import typing
+from pathlib import Path
+
+from loguru import logger
+
+from .users import Quota, User
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    time_bank REAL NOT NULL,
+    sticker_cost REAL NOT NULL,
+    max_stickers INTEGER NOT NULL,
+    last_checked_time REAL NOT NULL,
+    last_active REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_last_active ON users (last_active);
+"""
+
+UserRow = typing.Tuple[int, float, float, int, float, float]
+
+
+class UserStore:
+    """
+    Unlocked users and their quotas, kept in SQLite so they survive restarts.
+
+    Reads are served from memory. Changes are only marked here and written in batches by a
+    single background thread, so handlers never wait on the disk. Startup only loads users that
+    were active recently, anyone older is looked up off the event loop the first time they come
+    back. Users that have gone idle again are dropped from memory once they have been saved
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        quota: Quota,
+        active_within: float = 30 * 24 * 60 * 60,
+        flush_interval: float = 2.0,
+        max_absent: int = 10000,
+    ):
+        self.db_path = db_path
+        self.quota = quota
+        self.active_within = active_within
+        self.flush_interval = flush_interval
+        self.max_absent = max_absent
+
+        self._users: typing.Dict[int, User] = {}
+        # When each user in memory last unlocked or printed, what decides who is loaded at startup
+        self._last_active: typing.Dict[int, float] = {}
+        # Users recently found not to be in the database, so repeated lookups stay in memory.
+        # Least recently seen first, anyone can message the bot so this has to stay bounded
+        self._absent: typing.OrderedDict[int, None] = collections.OrderedDict()
+        self._dirty: typing.Set[int] = set()
+        # One thread owns the write connection, which also keeps batches in order
+        self._writer = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="user-store"
+        )
+        self._reader = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="user-store-read"
+        )
+        self._write_db: typing.Optional[sqlite3.Connection] = None
+        self._read_db: typing.Optional[sqlite3.Connection] = None
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def open(self) -> None:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer.submit(self._open_writer).result()
+        self._read_db = self._connect()
+        since = time.time() - self.active_within if self.active_within else 0
+        rows = self._read_db.execute(
+            "SELECT * FROM users WHERE last_active >= ?", (since,)
+        ).fetchall()
+        for row in rows:
+            self._cache(row=row)
+        logger.debug(f"Loaded {len(rows)} recently active users from {self.db_path}")
+
+    async def get(self, user_id: int) -> typing.Optional[User]:
+        """
+        :return: The user, None if they haven't unlocked the printer
+        """
+        user = self._users.get(user_id)
+        if user is not None:
+            return user
+        if user_id in self._absent:
+            self._absent.move_to_end(user_id)
+            return None
+        # Someone who hasn't been around in a while, a single primary key lookup
+        row = await asyncio.get_running_loop().run_in_executor(
+            self._reader, self._select, user_id
+        )
+        if user_id in self._users:
+            # Added or loaded by another message while this one was looking
+            return self._users[user_id]
+        if row is None:
+            self._absent[user_id] = None
+            if len(self._absent) > self.max_absent:
+                self._absent.popitem(last=False)
+            return None
+        return self._cache(row=row)
+
+    def add(self, user_id: int, user: User) -> None:
+        self._users[user_id] = user
+        self._absent.pop(user_id, None)
+        self.changed(user_id=user_id)
+
+    def changed(self, user_id: int) -> None:
+        """
+        Queue a user's current state to be written with the next batch, counting it as activity
+        """
+        self._last_active[user_id] = time.time()
+        self._dirty.add(user_id)
+
+    def set_quota(self, sticker_cost: float, max_stickers: int) -> None:
+        """
+        Move every user onto a new quota, the ones in memory now and the rest when they are
+        loaded
+        """
+        self.quota.change(
+            users=self._users.values(),
+            sticker_cost=sticker_cost,
+            max_stickers=max_stickers,
+        )
+        # Not activity, everyone keeps their last active time
+        self._dirty.update(self._users)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch = self._take_batch()
+        if batch:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._writer, self._write, batch
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Unable to save users to {self.db_path}, will retry: {e}")
+                self._requeue(batch)
+                return
+        self._evict_idle()
+
+    def close(self) -> None:
+        batch = self._take_batch()
+        if batch:
+            try:
+                self._writer.submit(self._write, batch).result()
+            except sqlite3.Error as e:
+                logger.error(f"Unable to save users to {self.db_path}: {e}")
+        self._writer.submit(self._close_writer).result()
+        self._writer.shutdown()
+        self._reader.shutdown()
+        if self._read_db is not None:
+            self._read_db.close()
+
+    def _cache(self, row: UserRow) -> User:
+        (
+            user_id,
+            time_bank,
+            sticker_cost,
+            max_stickers,
+            last_checked_time,
+            last_active,
+        ) = row
+        user = self.quota.load(
+            time_bank=time_bank,
+            sticker_cost=sticker_cost,
+            max_stickers=max_stickers,
+            last_checked_time=last_checked_time,
+        )
+        self._users[user_id] = user
+        self._last_active[user_id] = last_active
+        return user
+
+    def _evict_idle(self) -> None:
+        """
+        Drop users that haven't been active within active_within from memory, as long as they
+        are saved and have no prints queued. They are looked up again if they come back
+        """
+        if not self.active_within:
+            return
+        idle_since = time.time() - self.active_within
+        idle = [
+            user_id
+            for user_id, user in self._users.items()
+            if self._last_active[user_id] < idle_since
+            and user_id not in self._dirty
+            and not user.reserved
+        ]
+        for user_id in idle:
+            del self._users[user_id]
+            del self._last_active[user_id]
+        if idle:
+            logger.debug(f"Dropped {len(idle)} idle users from memory")
+
+    def _select(self, user_id: int) -> typing.Optional[UserRow]:
+        return self._read_db.execute(
+            "SELECT * FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+
+    def _take_batch(self) -> typing.List[UserRow]:
+        """
+        Snapshot everything that changed, on the event loop so the writer never sees a user
+        halfway through an update
+        """
+        users: typing.List[UserRow] = []
+        for user_id in self._dirty:
+            user = self._users[user_id]
+            time_bank, last_checked_time = self.quota.save(user)
+            users.append(
+                (
+                    user_id,
+                    time_bank,
+                    self.quota.sticker_cost,
+                    self.quota.max_stickers,
+                    last_checked_time,
+                    self._last_active[user_id],
+                )
+            )
+        self._dirty.clear()
+        return users
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Commits in WAL mode only need to reach the log, checkpoints do the syncing
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _open_writer(self) -> None:
+        self._write_db = self._connect()
+        self._write_db.executescript(SCHEMA)
+
+    def _close_writer(self) -> None:
+        if self._write_db is not None:
+            self._write_db.close()
+            self._write_db = None
+
+    def _write(self, users: typing.List[UserRow]) -> None:
+        with self._write_db:
+            self._write_db.executemany(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)", users
+            )
+
+    def _requeue(self, users: typing.List[UserRow]) -> None:
+        # The batch was rolled back, so it goes out again with the next one
+        for row in users:
+            self._dirty.add(row[0])
@@ -2,68 +2,123 @@ from __future__ import annotations
 
 import time
 import typing
-from pathlib import Path
 
 from attr import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
-    # The amount of seconds the user has banked
-    time_bank: float
-    # The cost of each sticker in seconds
-    sticker_cost: float
-    # The max number of stickers a user can accrue
-    max_stickers: int
-    # The last we checked the bank
-    last_checked_time: float
-    # All the images that printed
-    printed_images: typing.List[Path]
-
-    @property
-    def maxed_time_bank(self) -> bool:
-        self.update_time_bank()
-        return self.time_bank > (self.max_stickers * self.sticker_cost)
-
-    @property
-    def stickers_remaining(self):
-        self.update_time_bank()
-        if self.maxed_time_bank:
-            return self.max_stickers
-        return int(self.time_bank / self.sticker_cost)
-
-    def use_sticker(self, image_printed: Path):
-        self.update_time_bank()
-        if self.stickers_remaining:
-            if self.maxed_time_bank:
-                self.time_bank = (
-                    self.max_stickers * self.sticker_cost
-                ) - self.sticker_cost
-            else:
-                self.time_bank -= self.sticker_cost
-            self.printed_images.append(image_printed)
-
-    def update_time_bank(self):
-        self.time_bank += time.time() - self.last_checked_time
-        self.last_checked_time = time.time()
-
-    @classmethod
-    def new_user(cls, max_stickers: int, sticker_cost: float) -> User:
-        return User(
-            time_bank=max_stickers * sticker_cost,
-            sticker_cost=sticker_cost,
-            max_stickers=max_stickers,
-            last_checked_time=time.time(),
-            printed_images=[],
+    # Stickers in the bucket as of updated, reserved ones are already taken out
+    tokens: float
+    # The quota clock reading tokens was last brought up to date at
+    updated: float
+    # Stickers taken for queued prints that haven't finished yet
+    reserved: int = 0
+
+
+class Quota:
+    """
+    Token bucket sticker quota. Everyone's bucket holds up to max_stickers and refills by one
+    sticker every sticker_cost seconds, worked out from the time since it was last touched so
+    nothing runs in the background.
+
+    A sticker is reserved when a print is queued, so a burst of requests can't get more past the
+    check than the user has. The reservation is committed once the print is done, or refunded if
+    it fails. Time is measured with a monotonic clock so NTP adjustments don't hand out or take
+    away stickers
+    """
+
+    def __init__(
+        self,
+        sticker_cost: float,
+        max_stickers: int,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.sticker_cost = sticker_cost
+        self.max_stickers = max_stickers
+        self.clock = clock
+
+    def new_user(self) -> User:
+        return User(tokens=self.max_stickers, updated=self.clock())
+
+    def refill(self, user: User) -> float:
+        """
+        :return: Stickers in the user's bucket right now
+        """
+        now = self.clock()
+        user.tokens = min(
+            self.max_stickers, user.tokens + (now - user.updated) / self.sticker_cost
         )
+        user.updated = now
+        return user.tokens
+
+    def remaining(self, user: User) -> int:
+        return int(self.refill(user))
+
+    def reserve(self, user: User) -> bool:
+        """
+        Take a sticker for a print that is about to be queued
+        :return: False if the user has none left
+        """
+        if self.refill(user) < 1:
+            return False
+        user.tokens -= 1
+        user.reserved += 1
+        return True
 
-    @property
-    def remaining_stickers_str(self) -> str:
-        self.update_time_bank()
-        if self.stickers_remaining:
+    def commit(self, user: User) -> None:
+        user.reserved -= 1
+
+    def refund(self, user: User) -> None:
+        self.refill(user)
+        user.reserved -= 1
+        user.tokens = min(self.max_stickers, user.tokens + 1)
+
+    def change(
+        self, users: typing.Iterable[User], sticker_cost: float, max_stickers: int
+    ) -> None:
+        """
+        Move to a new cost and max. Buckets are topped up at the old rate first, users keep the
+        stickers they have up to the new max
+        """
+        users = list(users)
+        for user in users:
+            self.refill(user)
+        self.sticker_cost = sticker_cost
+        self.max_stickers = max_stickers
+        for user in users:
+            user.tokens = min(max_stickers, user.tokens)
+
+    def save(self, user: User) -> typing.Tuple[float, float]:
+        """
+        :return: Seconds banked and the wall clock time they were counted at, what the database
+        keeps. Stickers reserved for queued prints are counted as unspent, the queue doesn't
+        survive a restart
+        """
+        tokens = min(self.max_stickers, self.refill(user) + user.reserved)
+        return tokens * self.sticker_cost, time.time()
+
+    def load(
+        self,
+        time_bank: float,
+        sticker_cost: float,
+        max_stickers: int,
+        last_checked_time: float,
+    ) -> User:
+        """
+        A user as saved, under whatever quota was in place then
+        """
+        tokens = min(time_bank / sticker_cost, max_stickers, self.max_stickers)
+        # The wall clock may have gone backwards while the bot was down
+        elapsed = max(0.0, time.time() - last_checked_time)
+        return User(tokens=tokens, updated=self.clock() - elapsed)
+
+    def describe(self, user: User) -> str:
+        remaining = self.remaining(user)
+        if remaining:
             retstr = (
-                f"You have {self.stickers_remaining} remaining sticker"
-                f"{'s' if self.stickers_remaining > 1 else ''}. "
+                f"You have {remaining} remaining sticker"
+                f"{'s' if remaining > 1 else ''}. "
             )
         else:
             retstr = f"You have no stickers remaining :( "
@@ -71,11 +126,3 @@ class User:
             f"{retstr}\nStickers recharge at a rate of 1 sticker every {self.sticker_cost} seconds "
             f"(up to {self.max_stickers} max)"
         )
-
-    @property
-    def user_info(self) -> str:
-        self.update_time_bank()
-        return (
-            f"You've printed {len(self.printed_images)} sticker{'s' if self.stickers_remaining > 1 else ''}.\n"
-            f"{self.remaining_stickers_str}"
-        )
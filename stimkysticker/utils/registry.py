@@ -0,0 +1,49 @@
+import importlib
+import typing
+
+T = typing.TypeVar("T")
+
+
+class LazyRegistry(typing.Mapping[str, T]):
+    """
+    Names mapped to objects that are only imported the first time they are looked up, so listing
+    or checking what's available never pulls in a module.
+
+    Entries are written as "module:attribute", with the module relative to package
+    """
+
+    def __init__(self, package: str, entries: typing.Dict[str, str]):
+        self.package = package
+        self._entries = dict(entries)
+        self._loaded: typing.Dict[str, T] = {}
+
+    def __getitem__(self, name: str) -> T:
+        loaded = self._loaded.get(name)
+        if loaded is not None:
+            return loaded
+        module_name, attribute = self._entries[name].split(":")
+        module = importlib.import_module(module_name, package=self.package)
+        loaded = self._loaded[name] = getattr(module, attribute)
+        return loaded
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def loaded(self) -> typing.Tuple[str, ...]:
+        return tuple(self._loaded)
+
+    def attribute(self, attribute: str) -> T:
+        """
+        Look an entry up by the name it has in its module, for the package's module __getattr__
+        """
+        for name, entry in self._entries.items():
+            if entry.split(":")[1] == attribute:
+                return self[name]
+        raise AttributeError(f"module {self.package!r} has no attribute {attribute!r}")
@@ -1,3 +1,5 @@
+import grp
+import os
 import random
 import time
 
@@ -52,3 +54,14 @@ def random_bad_emote() -> str:
             "¯\_(⌣̯̀ ⌣́)_/¯",
         ]
     )
+
+
+def user_in_group(group: str) -> bool:
+    """
+    The same answer as looking for the group in the output of `groups`, without running it
+    """
+    try:
+        gid = grp.getgrnam(group).gr_gid
+    except KeyError:
+        return False
+    return gid == os.getegid() or gid in os.getgroups()
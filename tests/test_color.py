@@ -0,0 +1,41 @@
+import random
+
+import pytest
+from PIL import Image
+
+from stimkysticker.labels.color import color_correct
+
+
+def legacy_color_correct(
+    pil_img: Image.Image, gamma_correction: float, background_color: str
+) -> Image.Image:
+    # What the labels did before the lookup tables
+    if pil_img.mode == "RGBA":
+        bg_img = Image.new(pil_img.mode, pil_img.size, background_color)
+        pil_img = Image.alpha_composite(bg_img, pil_img)
+    pil_img = pil_img.convert("L")
+    if gamma_correction != 1:
+        pil_img = Image.eval(
+            pil_img, lambda x: int(255 * pow((x / 255), (1 / gamma_correction)))
+        )
+    return pil_img
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+@pytest.mark.parametrize("background_color", ["white", "black", "#3080c0"])
+@pytest.mark.parametrize("gamma_correction", [1, 1.8])
+def test_matches_legacy(mode: str, background_color: str, gamma_correction: float):
+    size = (64, 48)
+    noise = random.Random(0).randbytes(size[0] * size[1] * len(mode))
+    image = Image.frombytes(mode, size, noise)
+    corrected = color_correct(
+        pil_img=image,
+        gamma_correction=gamma_correction,
+        background_color=background_color,
+    )
+    legacy = legacy_color_correct(
+        pil_img=image,
+        gamma_correction=gamma_correction,
+        background_color=background_color,
+    )
+    assert corrected.tobytes() == legacy.tobytes()
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+from PIL import Image
+
+from stimkysticker.printers.raster import PackedBitmap
+
+
+def pack_per_pixel(image: Image.Image) -> bytes:
+    # The packer PackedBitmap replaced, one pixel at a time straight through the image
+    data = bytearray()
+    current_byte = 0
+    shifter = 7
+    for pixel in image.convert("1").getdata():
+        if shifter == -1:
+            data.append(current_byte)
+            current_byte = 0
+            shifter = 7
+        if pixel == 0:
+            current_byte |= 1 << shifter
+        shifter -= 1
+    data.append(current_byte)
+    return bytes(data)
+
+
+def random_image(width: int, height: int, seed: int) -> Image.Image:
+    noise = random.Random(seed).randbytes(width * height)
+    return Image.frombytes("L", (width, height), noise)
+
+
+@pytest.mark.parametrize("width", [384, 696])
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_per_pixel_packer(width: int, seed: int):
+    image = random_image(width=width, height=97, seed=seed)
+    assert PackedBitmap.from_image(image=image).data == pack_per_pixel(image)
+
+
+@pytest.mark.parametrize("width", [384, 696])
+@pytest.mark.parametrize("color, byte", [("white", 0x00), ("black", 0xFF)])
+def test_solid_images(width: int, color: str, byte: int):
+    image = Image.new("1", (width, 40), color)
+    bitmap = PackedBitmap.from_image(image=image)
+    assert bitmap.data == pack_per_pixel(image)
+    assert bitmap.data == bytes([byte]) * (width // 8 * 40)
+
+
+def test_rows_padded_to_whole_bytes():
+    image = Image.new("1", (10, 3), "black")
+    bitmap = PackedBitmap.from_image(image=image)
+    assert bitmap.row_bytes == 2
+    assert bitmap.data == bytes([0xFF, 0xC0]) * 3
+
+
+def test_round_trip():
+    image = random_image(width=203, height=31, seed=7).convert("1")
+    bitmap = PackedBitmap.from_image(image=image)
+    assert bitmap.to_image().tobytes() == image.tobytes()
+    assert PackedBitmap.from_buffer(data=bitmap.data, width_px=203) == bitmap
+
+
+def test_chunks_are_row_aligned_views():
+    bitmap = PackedBitmap.from_image(image=random_image(width=384, height=10, seed=1))
+    chunks = bitmap.chunks(max_rows=4)
+    assert [len(chunk) for chunk in chunks] == [4 * 48, 4 * 48, 2 * 48]
+    assert b"".join(chunks) == bitmap.data
+    with pytest.raises(ValueError):
+        bitmap.chunks(max_rows=0)
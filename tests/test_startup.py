@@ -0,0 +1,8 @@
+from benchmarks.startup import DEFAULT_BUDGET, ENTRY_POINT, LAZY_MODULES, import_times
+
+
+def test_daemon_imports_quickly_and_lazily():
+    times = import_times(ENTRY_POINT)
+    _, cumulative_us = times[ENTRY_POINT]
+    assert cumulative_us / 1e6 < DEFAULT_BUDGET
+    assert [name for name in LAZY_MODULES if name in times] == []